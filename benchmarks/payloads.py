@@ -0,0 +1,112 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+
+#-----------------------------------------------------------------------------#
+
+# Recorded Binance responses live next to this file
+RECORDED_DIR = Path(__file__).resolve().parent / "recorded"
+
+
+def make_klines(count, start_price=60000.0, interval_ms=3600000, seed=1,
+                end_time=1700000000000):
+    '''Synthetic Binance klines (random walk), same layout as /api/v3/klines,
+    the last one opening before end_time'''
+    rng = random.Random(seed)
+    start_time = end_time // interval_ms * interval_ms - count * interval_ms
+    price = start_price
+    klines = []
+
+    for i in range(count):
+        open_price = price
+        close_price = open_price * (1 + rng.gauss(0, 0.004))
+        high = max(open_price, close_price) * (1 + abs(rng.gauss(0, 0.002)))
+        low = min(open_price, close_price) * (1 - abs(rng.gauss(0, 0.002)))
+        volume = rng.uniform(50, 1500)
+        open_time = start_time + i * interval_ms
+
+        klines.append([
+            open_time, f"{open_price:.2f}", f"{high:.2f}", f"{low:.2f}",
+            f"{close_price:.2f}", f"{volume:.5f}", open_time + interval_ms - 1,
+            "0", 0, "0", "0", "0"
+        ])
+        price = close_price
+
+    return klines
+
+
+def make_depth(depth, mid_price=60000.0, tick=0.01, seed=1):
+    '''Synthetic Binance order book, same layout as /api/v3/depth'''
+    rng = random.Random(seed)
+    bids = [[f"{mid_price - (i + 1) * tick:.2f}", f"{rng.uniform(0.001, 3):.8f}"]
+            for i in range(depth)]
+    asks = [[f"{mid_price + (i + 1) * tick:.2f}", f"{rng.uniform(0.001, 3):.8f}"]
+            for i in range(depth)]
+    return {"lastUpdateId": 1, "bids": bids, "asks": asks}
+
+
+def make_ticker_messages(count, symbol="BTCUSDT", start_price=60000.0, seed=1):
+    '''Synthetic @ticker websocket messages (JSON strings)'''
+    rng = random.Random(seed)
+    price = start_price
+    messages = []
+
+    for _ in range(count):
+        price *= 1 + rng.gauss(0, 0.0002)
+        change = price - start_price
+        messages.append(json.dumps({
+            "e": "24hrTicker", "s": symbol, "c": f"{price:.2f}",
+            "p": f"{change:.2f}", "P": f"{change / start_price * 100:.3f}"
+        }))
+
+    return messages
+
+
+def load_recorded(name):
+    '''Load a recorded response, or None if it wasn't recorded'''
+    path = RECORDED_DIR / f"{name}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def record(symbol="BTCUSDT"):
+    '''Save real Binance responses for the benchmarks to replay'''
+    import requests
+
+    RECORDED_DIR.mkdir(exist_ok=True)
+    recordings = {
+        f"klines_{symbol}_1m_1000": (
+            "https://api.binance.com/api/v3/klines",
+            {"symbol": symbol, "interval": "1m", "limit": 1000}
+        ),
+        f"depth_{symbol}_50": (
+            "https://api.binance.com/api/v3/depth",
+            {"symbol": symbol, "limit": 50}
+        )
+    }
+
+    for name, (url, params) in recordings.items():
+        data = requests.get(url, params=params, timeout=10).json()
+        with open(RECORDED_DIR / f"{name}.json", "w") as f:
+            json.dump(data, f)
+        print(f"[Payloads] Recorded {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark payloads")
+    parser.add_argument("--record", action="store_true",
+                        help="record real Binance responses into benchmarks/recorded")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    args = parser.parse_args()
+
+    if not args.record:
+        parser.print_help()
+        sys.exit(1)
+    record(args.symbol)
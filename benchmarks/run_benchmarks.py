@@ -0,0 +1,347 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+from pathlib import Path
+from unittest import mock
+
+# Render with Agg, the Tk canvas only blits the result
+import matplotlib
+matplotlib.use("Agg")
+
+import tkinter as tk
+
+from components import venues
+from components.candlestick_chart import Candlestickchart
+from components.orderbook import OrderBookPanel
+from components.toggleable_ticker import CryptoTicker
+from components.refresh_scheduler import RefreshScheduler
+from components.venues import StaticVenue
+from components.ohlc_pyramid import OHLCPyramid, klines_to_arrays
+from benchmarks import payloads
+
+#-----------------------------------------------------------------------------#
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+
+
+class FakeResponse:
+    '''Stands in for requests.Response'''
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+    def json(self):
+        return self.payload
+
+
+class FakeRequests:
+    '''Stands in for the requests module, always returns the same payload'''
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+    def get(self, url, params=None, timeout=None):
+        return FakeResponse(self.payload)
+
+
+def measure(func, repeats, warmup=1):
+    '''Median time of func() in milliseconds'''
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+#-----------------------------------------------------------------------------#
+# Hot paths
+
+
+def make_chart(root, scheduler, klines):
+    '''Live chart holding klines as its 1 minute history'''
+    frame = tk.Frame(root)
+    frame.pack(fill="both", expand=True)
+    label = tk.Label(root)
+
+    chart = Candlestickchart("BTCUSDT", label, "BTC/USDT", scheduler)
+    chart.initialize_graph(frame)
+    chart.pyramid = OHLCPyramid(klines_to_arrays(klines))
+    chart.is_live = True
+    chart.is_active = True
+    return chart, frame, label
+
+
+def bench_candlestick(root, scheduler, klines, repeats):
+    '''Candlestickchart.update_graph merge + render of every candle
+    (forced draw)'''
+    chart, frame, label = make_chart(root, scheduler, klines)
+    # Whole history in view at 1 minute resolution
+    first, last = chart.pyramid.span()
+    chart.view_span = last - first + 60000
+    chart.max_candles = len(klines)
+
+    def run():
+        chart.update_graph()
+        # draw_idle only schedules, render now so it gets measured
+        chart.canvas.draw()
+
+    # Every refresh catches up from the newest candle (one short page)
+    with mock.patch.object(venues, "requests", FakeRequests(klines[-5:])):
+        result = measure(run, repeats)
+
+    chart.is_active = False
+    frame.destroy()
+    label.destroy()
+    return result
+
+
+def bench_pan_zoom(root, scheduler, klines, repeats):
+    '''Zooming from an hour out to the whole history and back, per step,
+    with the candle budget from the chart width'''
+    chart, frame, label = make_chart(root, scheduler, klines)
+    root.update()
+    end = chart.pyramid.span()[1]
+    spans = [60000 * 60 * 1.5 ** i for i in range(30)]
+    spans += spans[::-1]
+
+    def run():
+        for i, span in enumerate(spans):
+            # Pan a little on every step too
+            shift = i * span * 0.05
+            chart.set_view(end - span - shift, end - shift)
+            chart.canvas.draw()
+
+    result = measure(run, repeats) / len(spans)
+
+    chart.is_active = False
+    frame.destroy()
+    label.destroy()
+    return result
+
+
+def bench_parse(klines, repeats):
+    '''Raw klines -> arrays -> OHLCPyramid, what the chart does with its
+    first page'''
+    return measure(lambda: OHLCPyramid(klines_to_arrays(klines)), repeats)
+
+
+def bench_pyramid_build(arrays, repeats):
+    '''OHLCPyramid from scratch, and merging the live candle into it'''
+    build = measure(lambda: OHLCPyramid(arrays), repeats)
+
+    pyramid = OHLCPyramid(arrays)
+    tail = {key: value[-5:] for key, value in arrays.items()}
+    merge = measure(lambda: pyramid.merge(tail), repeats * 10)
+    return build, merge
+
+
+def bench_orderbook(root, scheduler, depth, books, repeats):
+    '''OrderBookPanel.update_orderbook label updates at a given depth,
+    merged over one stand-in venue per book'''
+    frame = tk.Frame(root)
+    frame.pack(fill="y")
+
+    stand_ins = [StaticVenue(f"Venue {i}", f"V{i}", {"BTCUSDT": (b["bids"], b["asks"])})
+                 for i, b in enumerate(books)]
+    panel = OrderBookPanel(frame, scheduler, "BTCUSDT", rows=depth,
+                           venues=stand_ins)
+
+    def run():
+        # Force a re-merge, like a venue changing between refreshes
+        panel.book.clear()
+        panel.update_orderbook()
+        # Include Tk's geometry and redraw work for the new texts
+        root.update_idletasks()
+
+    result = measure(run, repeats)
+
+    panel.stop()
+    scheduler.unregister(panel.job)
+    frame.destroy()
+    return result
+
+
+def bench_ticker(root, messages, repeats):
+    '''CryptoTicker.on_message -> update_display, per message'''
+    frame = tk.Frame(root)
+    frame.pack(fill="x")
+
+    ticker = CryptoTicker(frame, "btcusdt", "BTC/USDT")
+    ticker.pack(side=tk.LEFT)
+    # No websocket, messages are fed in directly
+    ticker.is_active = True
+
+    def run():
+        for message in messages:
+            ticker.on_message(None, message)
+        # Drain the after(0, ...) callbacks and redraw
+        root.update()
+
+    result = measure(run, repeats) / len(messages)
+
+    ticker.is_active = False
+    frame.destroy()
+    return result
+
+
+def run_suite(root, quick=False, recorded=False):
+    '''Run every benchmark, returns name -> median milliseconds
+
+    The recorded payloads aren't committed, so their cases only run when
+    asked for (the default set of names is the same on every machine).
+    '''
+    scheduler = RefreshScheduler(root)
+    results = {}
+    repeats = 3 if quick else 10
+
+    for count in (24, 500, 5000):
+        klines = payloads.make_klines(count, interval_ms=60000)
+        results[f"candlestick.parse[{count} x 1m]"] = bench_parse(klines, repeats)
+        results[f"candlestick.merge_render[{count} x 1m]"] = bench_candlestick(
+            root, scheduler, klines, repeats)
+
+    klines = payloads.load_recorded("klines_BTCUSDT_1m_1000") if recorded else None
+    if klines:
+        results["candlestick.parse[recorded 1000 x 1m]"] = bench_parse(klines, repeats)
+        results["candlestick.merge_render[recorded 1000 x 1m]"] = bench_candlestick(
+            root, scheduler, klines, repeats)
+
+    # A year of 1 minute candles
+    year = payloads.make_klines(365 * 1440, interval_ms=60000)
+    build, merge = bench_pyramid_build(klines_to_arrays(year), max(2, repeats // 3))
+    results["pyramid.build[1 year]"] = build
+    results["pyramid.merge[1 year, 5 candles]"] = merge
+    results["candlestick.pan_zoom[1 year, per step]"] = bench_pan_zoom(
+        root, scheduler, year, max(2, repeats // 3))
+
+    for depth in (10, 25, 50):
+        results[f"orderbook.update_orderbook[{depth}]"] = bench_orderbook(
+            root, scheduler, depth, [payloads.make_depth(depth)], repeats)
+
+    # Consolidated over 3 venues with slightly different prices
+    books = [payloads.make_depth(50, mid_price=60000.0 + i * 0.005, seed=i)
+             for i in range(3)]
+    results["orderbook.update_orderbook[3 venues, 50]"] = bench_orderbook(
+        root, scheduler, 50, books, repeats)
+
+    depth = payloads.load_recorded("depth_BTCUSDT_50") if recorded else None
+    if depth:
+        results["orderbook.update_orderbook[recorded 50]"] = bench_orderbook(
+            root, scheduler, 50, [depth], repeats)
+
+    results["ticker.on_message[per message]"] = bench_ticker(
+        root, payloads.make_ticker_messages(1000), repeats)
+
+    return results
+
+
+#-----------------------------------------------------------------------------#
+# Baseline
+
+
+def load_baseline(path):
+    '''Baseline results, or None if there is none yet'''
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path, results):
+    '''Write results as the new baseline'''
+    with open(path, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "matplotlib": matplotlib.__version__,
+            "results": results
+        }, f, indent=2)
+
+
+def compare(results, baseline, threshold):
+    '''Print a results table, returns the names that regressed'''
+    regressions = []
+    print(f"{'benchmark':45} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:45} {'--':>10} {current:10.3f} {'new':>8}")
+            continue
+
+        change = (current - previous) / previous
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:45} {previous:10.3f} {current:10.3f} {change:+8.1%}{flag}")
+
+    # e.g. recorded cases in the baseline but not run this time
+    for name in baseline:
+        if name not in results:
+            print(f"{name:45} {baseline[name]:10.3f} {'--':>10} {'missing':>8}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORBIT component benchmarks")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE,
+                        help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer repeats (noisier)")
+    parser.add_argument("--recorded", action="store_true",
+                        help="also replay benchmarks/recorded (python -m "
+                             "benchmarks.payloads --record)")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as err:
+        print(f"[Benchmark] Tk unavailable ({err}), on a headless machine run "
+              "it under Xvfb: xvfb-run python -m benchmarks.run_benchmarks")
+        return 2
+    root.geometry("960x720")
+
+    try:
+        results = run_suite(root, args.quick, args.recorded)
+    finally:
+        root.destroy()
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None or args.update_baseline:
+        save_baseline(args.baseline, results)
+        for name, current in results.items():
+            print(f"{name:45} {current:10.3f} ms")
+        print(f"[Benchmark] Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"[Benchmark] {len(regressions)} regression(s) beyond "
+              f"{args.threshold:.0%}")
+        return 1
+
+    print("[Benchmark] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
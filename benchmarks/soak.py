@@ -0,0 +1,378 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import threading
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import matplotlib
+matplotlib.use("Agg")
+
+import tkinter as tk
+
+from components import venues
+from components.toggleable_ticker import ToggleableTickerApp
+from components.candlestick_chart import Candlestickchart
+from components.orderbook import OrderBookPanel
+from components.trade_tape import TradeTapePanel
+from components.refresh_scheduler import RefreshScheduler
+from components.state_snapshot import StateSnapshot
+from benchmarks import payloads
+from benchmarks.run_benchmarks import FakeResponse
+
+#-----------------------------------------------------------------------------#
+
+REPORT_FILE = Path(__file__).resolve().parent / "soak_report.json"
+
+SYMBOLS = [("BTCUSDT", "BTC/USDT"), ("ETHUSDT", "ETH/USDT"),
+           ("SOLUSDT", "SOL/USDT"), ("DOGEUSDT", "DOGE/USDT"),
+           ("SHIBUSDT", "SHIB/USDT")]
+
+
+class SyntheticWebSocketApp:
+    '''Stands in for websocket.WebSocketApp, emits synthetic messages
+
+    Ticker URLs get @ticker messages, aggTrade URLs get trades, at a fixed
+    rate until close() is called (like run_forever returning).
+    '''
+
+    rate = 50
+
+    def __init__(self, url, on_message=None, on_error=None, on_close=None,
+                 on_open=None):
+        self.url = url
+        self.on_message = on_message
+        self.on_close = on_close
+        self.on_open = on_open
+        self.closed = threading.Event()
+
+
+    def run_forever(self):
+        rng = random.Random()
+        price = 60000.0
+        if self.on_open:
+            self.on_open(self)
+
+        while not self.closed.wait(1 / self.rate):
+            price *= 1 + rng.gauss(0, 0.0002)
+            if "@aggTrade" in self.url:
+                message = {"T": int(time.time() * 1000), "p": f"{price:.2f}",
+                           "q": f"{rng.uniform(0.0001, 2):.5f}",
+                           "m": rng.random() < 0.5}
+            else:
+                change = price - 60000.0
+                message = {"c": f"{price:.2f}", "p": f"{change:.2f}",
+                           "P": f"{change / 600:.3f}"}
+            self.on_message(self, json.dumps(message))
+
+        if self.on_close:
+            self.on_close(self, None, None)
+
+
+    def close(self):
+        self.closed.set()
+
+
+class SyntheticRequests:
+    '''Stands in for requests, returns fresh klines/depth on every call'''
+
+    def __init__(self):
+        self.calls = 0
+
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        if "klines" in url:
+            # 1 minute candles, paged back with endTime and caught up
+            # with startTime by the chart
+            now = int(time.time() * 1000)
+            count, end_time = params["limit"], params.get("endTime", now) + 1
+            if "startTime" in params:
+                start = params["startTime"] // 60000 * 60000
+                count = min(count, (now - start) // 60000 + 1)
+                end_time = start + count * 60000
+            payload = payloads.make_klines(
+                count, interval_ms=60000, seed=self.calls, end_time=end_time)
+        else:
+            payload = payloads.make_depth(params["limit"], seed=self.calls)
+        return FakeResponse(payload)
+
+
+#-----------------------------------------------------------------------------#
+# Sampling
+
+
+def read_rss_mb():
+    '''Current resident set size in MB'''
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+
+    # Linux without psutil
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return float("nan")
+
+
+def slope_per_hour(samples, key):
+    '''Least squares growth of samples[key] per hour of run time'''
+    points = [(s["elapsed_s"], s[key]) for s in samples]
+    if len(points) < 2:
+        return 0.0
+
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if var_t == 0:
+        return 0.0
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    return cov / var_t * 3600
+
+
+class SoakRun:
+    '''Drives the dashboard components with synthetic feeds and samples
+    memory, allocations, threads and the Tk after queue over time'''
+
+    def __init__(self, root, speed, toggle_every_s, sample_every_s, warmup_s):
+        self.root = root
+        self.speed = speed
+        self.toggle_every_ms = int(toggle_every_s * 1000)
+        self.sample_every_ms = int(sample_every_s * 1000)
+        self.warmup_s = warmup_s
+
+        self.samples = []
+        self.start_time = None
+        self.first_snapshot = None
+        self.top_allocators = []
+        self.toggles = 0
+
+        self.state_dir = tempfile.TemporaryDirectory()
+        self._build_app()
+
+
+    def _build_app(self):
+        '''Same layout as main.py, on a throwaway state file'''
+        self.scheduler = RefreshScheduler(self.root)
+
+        price_frame = tk.Frame(self.root)
+        price_frame.pack(fill="x")
+        detail_frame = tk.Frame(self.root)
+        detail_frame.pack(fill="both", expand=True)
+        chart_frame = tk.Frame(detail_frame)
+        chart_frame.pack(side="left", fill="both", expand=True)
+        side_frame = tk.Frame(detail_frame)
+        side_frame.pack(side="right", fill="y")
+        label = tk.Label(price_frame)
+        label.pack()
+
+        self.snapshot = StateSnapshot(Path(self.state_dir.name) / "state.json")
+        self.snapshot.load()
+
+        self.tickers = ToggleableTickerApp(price_frame, self.root, self.snapshot)
+        self.tickers.set_preference()
+
+        # A few days of history, reloaded on every currency switch
+        self.chart = Candlestickchart("BTCUSDT", label, "BTC/USDT",
+                                      self.scheduler, self.snapshot,
+                                      history_days=3)
+        self.chart.initialize_graph(chart_frame)
+        self.chart.start()
+
+        self.orderbook = OrderBookPanel(side_frame, self.scheduler, "BTCUSDT",
+                                        self.snapshot)
+        self.trade_tape = TradeTapePanel(side_frame, self.scheduler, "BTCUSDT")
+
+        # Accelerate every periodic job
+        for job in self.scheduler.jobs:
+            job.interval_ms = max(10, job.interval_ms / self.speed)
+        self.scheduler.start()
+
+
+    def toggle_step(self):
+        '''Flip a random ticker and switch currency, like a user would'''
+        self.toggles += 1
+        name = random.choice(list(self.tickers.tickers))
+        getattr(self.tickers, f"toggle_{name}")()
+
+        symbol, display = SYMBOLS[self.toggles % len(SYMBOLS)]
+        self.chart.switch_graph(symbol, display)
+        self.orderbook.switch_currency(symbol)
+        self.trade_tape.switch_currency(symbol)
+
+        self.root.after(self.toggle_every_ms, self.toggle_step)
+
+
+    def sample(self):
+        '''Record one sample of every tracked metric'''
+        elapsed = time.monotonic() - self.start_time
+        current, _ = tracemalloc.get_traced_memory()
+
+        self.samples.append({
+            "elapsed_s": elapsed,
+            "rss_mb": read_rss_mb(),
+            "traced_mb": current / 2**20,
+            "threads": threading.active_count(),
+            "after_queue": len(self.root.tk.splitlist(self.root.tk.call("after", "info")))
+        })
+
+        # Compare allocations against the first sample after warmup
+        if elapsed >= self.warmup_s:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__)
+            ])
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot
+            else:
+                self.top_allocators = [
+                    {"where": str(stat.traceback), "growth_kb": stat.size_diff / 1024,
+                     "count_diff": stat.count_diff}
+                    for stat in snapshot.compare_to(self.first_snapshot, "lineno")[:10]
+                ]
+
+        last = self.samples[-1]
+        print(f"[Soak] {elapsed:7.0f}s  rss {last['rss_mb']:7.1f} MB  "
+              f"traced {last['traced_mb']:6.1f} MB  threads {last['threads']:3d}  "
+              f"after {last['after_queue']:3d}")
+
+        self.root.after(self.sample_every_ms, self.sample)
+
+
+    def run(self, duration_s):
+        '''Run for duration_s seconds and return the report'''
+        tracemalloc.start(10)
+        self.start_time = time.monotonic()
+
+        self.root.after(self.toggle_every_ms, self.toggle_step)
+        self.root.after(0, self.sample)
+        self.root.after(int(duration_s * 1000), self.root.quit)
+        self.root.mainloop()
+
+        self.scheduler.stop()
+        self.chart.stop()
+        self.orderbook.stop()
+        self.trade_tape.stop()
+        for ticker in self.tickers.tickers.values():
+            ticker.stop()
+        tracemalloc.stop()
+        self.state_dir.cleanup()
+
+        return self.report()
+
+
+    def report(self):
+        '''Growth trends over the samples taken after warmup'''
+        steady = [s for s in self.samples if s["elapsed_s"] >= self.warmup_s]
+        keys = ("rss_mb", "traced_mb", "threads", "after_queue")
+
+        return {
+            "duration_s": self.samples[-1]["elapsed_s"] if self.samples else 0,
+            "speed": self.speed,
+            "toggles": self.toggles,
+            "growth_per_hour": {key: slope_per_hour(steady, key) for key in keys},
+            "max": {key: max((s[key] for s in steady), default=0) for key in keys},
+            "first": steady[0] if steady else None,
+            "last": steady[-1] if steady else None,
+            "top_allocators": self.top_allocators,
+            "samples": self.samples
+        }
+
+
+def check(report, args):
+    '''Regression gate, returns the list of failed checks'''
+    growth = report["growth_per_hour"]
+    failures = []
+
+    if growth["rss_mb"] > args.max_rss_growth:
+        failures.append(f"RSS grows {growth['rss_mb']:.1f} MB/h "
+                        f"(limit {args.max_rss_growth})")
+    if growth["traced_mb"] > args.max_traced_growth:
+        failures.append(f"Python heap grows {growth['traced_mb']:.1f} MB/h "
+                        f"(limit {args.max_traced_growth})")
+    if report["first"] and report["last"]["threads"] - report["first"]["threads"] > args.max_thread_growth:
+        failures.append(f"Thread count grew from {report['first']['threads']} "
+                        f"to {report['last']['threads']}")
+    if report["max"]["after_queue"] > args.max_after_queue:
+        failures.append(f"Tk after queue reached {report['max']['after_queue']} "
+                        f"(limit {args.max_after_queue})")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORBIT soak test")
+    parser.add_argument("--duration", type=float, default=600,
+                        help="run time in seconds")
+    parser.add_argument("--speed", type=float, default=10,
+                        help="refresh acceleration factor")
+    parser.add_argument("--rate", type=int, default=50,
+                        help="synthetic websocket messages per second per stream")
+    parser.add_argument("--toggle-every", type=float, default=5,
+                        help="seconds between ticker toggles / currency switches")
+    parser.add_argument("--sample-every", type=float, default=10,
+                        help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=60,
+                        help="seconds ignored before measuring growth")
+    parser.add_argument("--report", type=Path, default=REPORT_FILE)
+    parser.add_argument("--gate", action="store_true",
+                        help="exit non-zero when a growth limit is exceeded")
+    parser.add_argument("--max-rss-growth", type=float, default=20,
+                        help="MB per hour")
+    parser.add_argument("--max-traced-growth", type=float, default=10,
+                        help="MB per hour")
+    parser.add_argument("--max-thread-growth", type=int, default=2)
+    parser.add_argument("--max-after-queue", type=int, default=50)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as err:
+        print(f"[Soak] Tk unavailable ({err}), on a headless machine run "
+              "it under Xvfb: xvfb-run python -m benchmarks.soak")
+        return 2
+    root.geometry("960x720")
+
+    SyntheticWebSocketApp.rate = args.rate
+    fake_requests = SyntheticRequests()
+
+    with mock.patch("websocket.WebSocketApp", SyntheticWebSocketApp), \
+            mock.patch.object(venues, "requests", fake_requests):
+        soak = SoakRun(root, args.speed, args.toggle_every, args.sample_every,
+                       args.warmup)
+        report = soak.run(args.duration)
+    root.destroy()
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("[Soak] Growth per hour:")
+    for key, value in report["growth_per_hour"].items():
+        print(f"  {key:12} {value:+10.2f}")
+    print("[Soak] Top allocators since warmup:")
+    for entry in report["top_allocators"][:5]:
+        print(f"  {entry['growth_kb']:+10.1f} KB  {entry['where']}")
+    print(f"[Soak] Report written to {args.report}")
+
+    failures = check(report, args)
+    for failure in failures:
+        print(f"[Soak] FAIL {failure}")
+
+    if args.gate and failures:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
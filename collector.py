@@ -0,0 +1,176 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import json
+import time
+import argparse
+import threading
+import websocket
+from concurrent.futures import ThreadPoolExecutor
+
+# Components Import
+
+from components.shared_feed import SharedFeedWriter, SHM_NAME, CANDLE_HISTORY
+from components.venues import BinanceVenue, BybitVenue, OkxVenue
+
+#-----------------------------------------------------------------------------#
+
+# Every currency the dashboard can show
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "DOGEUSDT", "SHIBUSDT"]
+
+
+class Collector:
+    '''Owns the exchange connections and publishes normalized ticks,
+    trades, books and candles into the shared memory ring buffer'''
+
+    def __init__(self, writer, symbols, venues, book_interval=3,
+                 candle_interval=5):
+        self.writer = writer
+        self.symbols = symbols
+        self.venues = venues
+        self.book_interval = book_interval
+        self.candle_interval = candle_interval
+
+        self.ws = None
+        self.stopped = threading.Event()
+        # Symbols whose whole candle history is published, cleared when a
+        # reader attaches (the trades lap the ring within seconds, so the
+        # last backfill is gone by then)
+        self.backfilled = set()
+        self.attach_count = writer.attach_count()
+        self.executor = ThreadPoolExecutor(max_workers=len(venues),
+                                           thread_name_prefix="venue")
+
+
+    def start(self):
+        '''Start the websocket and REST polling threads'''
+        # One combined stream for every ticker and aggTrade feed
+        streams = "/".join(f"{s.lower()}@ticker/{s.lower()}@aggTrade"
+                           for s in self.symbols)
+        ws_url = f"wss://stream.binance.com:9443/stream?streams={streams}"
+
+        self.ws = websocket.WebSocketApp(
+            ws_url,
+            on_message=self.on_message,
+            on_error=lambda ws, err: print(f"[Collector] Error: {err}"),
+            on_close=lambda ws, s, m: print("[Collector] Stream closed"),
+            on_open=lambda ws: print("[Collector] Stream connected")
+        )
+
+        threading.Thread(target=self.ws.run_forever, kwargs={"reconnect": 5},
+                         daemon=True, name="collector-ws").start()
+        threading.Thread(target=self.poll_rest, daemon=True,
+                         name="collector-rest").start()
+
+
+    def stop(self):
+        '''Stop every feed'''
+        self.stopped.set()
+        if self.ws:
+            self.ws.close()
+            self.ws = None
+        self.executor.shutdown(wait=True)
+
+
+    def on_message(self, ws, message):
+        '''Normalize stream messages into ticks and trades'''
+        data = json.loads(message)
+        stream = data["stream"]
+        payload = data["data"]
+
+        if stream.endswith("@ticker"):
+            self.writer.write_tick(payload["s"], payload["E"], float(payload["c"]),
+                                   float(payload["p"]), float(payload["P"]))
+        elif stream.endswith("@aggTrade"):
+            # "m" is True when the buyer is the maker, i.e. the aggressor sold
+            self.writer.write_trade(payload["s"], payload["T"], float(payload["p"]),
+                                    float(payload["q"]), not payload["m"])
+
+
+    def fetch_book(self, venue, symbol):
+        '''Fetch one venue's book and publish it'''
+        try:
+            bids, asks = venue.fetch_depth(symbol, 10)
+        except Exception as err:
+            print(f"[Collector] {venue.name} {symbol} failed: {err}")
+            return
+        self.writer.write_book(symbol, time.time() * 1000, venue.tag, bids, asks)
+
+
+    def fetch_candles(self, symbol, limit):
+        '''Fetch the latest 1 minute candles and publish them, returns
+        False if the request failed'''
+        try:
+            klines = self.venues[0].fetch_klines(symbol, "1m", limit)
+        except Exception as err:
+            print(f"[Collector] Candles {symbol} failed: {err}")
+            return False
+
+        for c in klines:
+            self.writer.write_candle(symbol, int(c[0]), float(c[1]), float(c[2]),
+                                     float(c[3]), float(c[4]), float(c[5]))
+        return True
+
+
+    def poll_rest(self):
+        '''Books and candles for every symbol, on a fixed interval'''
+        next_candles = 0.0
+
+        while not self.stopped.is_set():
+            start = time.monotonic()
+
+            for symbol in self.symbols:
+                # Venues in parallel, symbols one after another
+                list(self.executor.map(lambda v: self.fetch_book(v, symbol),
+                                       self.venues))
+
+            attach_count = self.writer.attach_count()
+            if attach_count != self.attach_count:
+                self.attach_count = attach_count
+                self.backfilled.clear()
+                next_candles = start
+
+            if start >= next_candles:
+                for symbol in self.symbols:
+                    # A full CANDLE_HISTORY for new readers, attached
+                    # charts don't fetch history of their own
+                    if symbol not in self.backfilled:
+                        if self.fetch_candles(symbol, CANDLE_HISTORY):
+                            self.backfilled.add(symbol)
+                    else:
+                        self.fetch_candles(symbol, 5)
+                next_candles = start + self.candle_interval
+
+            elapsed = time.monotonic() - start
+            self.stopped.wait(max(0.0, self.book_interval - elapsed))
+
+
+#-----------------------------------------------------------------------------#
+# Start collector
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Feed collector shared by every main.py --attach")
+    parser.add_argument("--name", default=SHM_NAME,
+                        help="shared memory name")
+    parser.add_argument("--capacity", type=int, default=32768,
+                        help="ring buffer slots")
+    args = parser.parse_args()
+
+    writer = SharedFeedWriter(args.name, args.capacity)
+    # Binance first, it also serves the candles
+    collector = Collector(writer, SYMBOLS, [BinanceVenue(), BybitVenue(), OkxVenue()])
+    collector.start()
+    print(f"[Collector] Publishing to shared memory '{args.name}' (Ctrl+C to stop)")
+
+    try:
+        while True:
+            # Readers grey out their data when this stops
+            writer.heartbeat()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
+        writer.close()
+        print("[Collector] Stopped")
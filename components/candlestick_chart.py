@@ -3,35 +3,94 @@
 
 import tkinter as tk
 import datetime
-import requests
+import threading
 import numpy as np
 
 import matplotlib
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.patches
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+from components.venues import BinanceVenue
+from components.ohlc_pyramid import (OHLCPyramid, LEVEL_NAMES, FIELDS,
+                                     klines_to_arrays)
 
 #-----------------------------------------------------------------------------#
 
+MINUTE_MS = 60000
+DAY_MS = 1440 * MINUTE_MS
+
+# Zooming in stops at 30 minutes across the chart
+MIN_SPAN_MS = 30 * MINUTE_MS
+# What the chart opens on (the old fixed 24 hourly candles)
+DEFAULT_SPAN_MS = DAY_MS
+# Binance's maximum klines per request
+PAGE_SIZE = 1000
+
 
 class Candlestickchart:
-    '''Candlestick Chart class'''
+    '''Candlestick Chart class
 
-    def __init__(self, initial_currency, label, displaytext):
+    Keeps up to history_days of 1 minute candles in an OHLCPyramid and
+    draws whatever the viewport covers from the level that gives about
+    one candle per px_per_candle pixels. Scroll to zoom, drag to pan;
+    while the view reaches the newest candle it follows the live data.
+    '''
+
+    def __init__(self, initial_currency, label, displaytext, scheduler,
+                 snapshot=None, feed=None, history_days=30):
         self.currency = initial_currency
         # Display text is for appearance purposes only
         self.displaytext = displaytext
         self.label = label
-
-        self.after_id = None
+        # Latest candles are kept in here for the next startup
+        self.snapshot = snapshot
+
+        # Candles come from the shared memory feed when attached to a
+        # collector (only the last CANDLE_HISTORY minutes), from Binance
+        # otherwise (with history_days of history)
+        self.feed = feed
+        self.venue = BinanceVenue()
+
+        # Refreshes are run by the shared RefreshScheduler
+        self.scheduler = scheduler
+        self.job = None
         self.is_active = False
 
+        # 1 minute history and its coarser levels
+        self.pyramid = OHLCPyramid()
+        # False while only cached candles are shown
+        self.is_live = False
+        self.history_days = min(max(1, history_days), 365)
+        # Bigger pyramids built by the history loader, swapped in on the
+        # next refresh: (generation, pyramid)
+        self.pending_pyramid = None
+        # Bumped to cancel a running history loader
+        self.generation = 0
+
+        # Viewport in ms, view_end None = follow the newest candle
+        self.view_span = DEFAULT_SPAN_MS
+        self.view_end = None
+        # Candle budget, None = from the chart width
+        self.max_candles = None
+        self.px_per_candle = 3
+        # (x pixel, start, end) while dragging
+        self.drag_from = None
+
         self.fig = None
         self.ax_price = None
         self.ax_volume = None
         self.canvas = None
         self.parent_frame = None
 
+        # Artists are created once and updated in place on every refresh
+        # (clearing the axes and adding new patches each time leaks)
+        self.wicks = None
+        self.bodies = None
+        self.volume_bars = None
+
 
     def initialize_graph(self, parent_frame):
         '''Build the graph UI'''
@@ -46,94 +105,348 @@ class Candlestickchart:
         self.ax_price = self.fig.add_subplot(2, 1, 1)
         self.ax_volume = self.fig.add_subplot(2, 1, 2, sharex=self.ax_price)
 
+        # PRICE AXIS
+        self.ax_price.set_facecolor("#1e1e1e")
+        self.ax_price.set_ylabel("Price", color="white")
+        self.ax_price.tick_params(axis="x", labelbottom=False, colors="white")
+        self.ax_price.tick_params(axis="y", colors="white")
+
+        self.wicks = LineCollection([], linewidths=1)
+        self.bodies = PolyCollection([], linewidths=0)
+        self.ax_price.add_collection(self.wicks)
+        self.ax_price.add_collection(self.bodies)
+
+        # VOLUME AXIS
+        self.ax_volume.set_facecolor("#1e1e1e")
+        self.ax_volume.set_ylabel("Volume", color="white")
+        self.ax_volume.tick_params(axis="y", colors="white")
+        self.ax_volume.tick_params(axis="x", colors="white", labelrotation=45)
+
+        self.volume_bars = PolyCollection([], facecolors="#5c7cfa", linewidths=0)
+        self.ax_volume.add_collection(self.volume_bars)
+
+        # Time axis in ms, labelled for however much is in view
+        self.ax_volume.xaxis.set_major_locator(MaxNLocator(8))
+        self.ax_volume.xaxis.set_major_formatter(FuncFormatter(self.timestamp_format))
+
+        # Style
+        for ax in (self.ax_price, self.ax_volume):
+            ax.grid(True, linestyle="--", alpha=0.15)
+            for spine in ax.spines.values():
+                spine.set_visible(False)
+
         # Canvas
         self.canvas = FigureCanvasTkAgg(self.fig, master=parent_frame)
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
 
-        # Initial draw
+        # Scroll to zoom, drag to pan
+        self.canvas.mpl_connect("scroll_event", self.on_scroll)
+        self.canvas.mpl_connect("button_press_event", self.on_press)
+        self.canvas.mpl_connect("motion_notify_event", self.on_drag)
+        self.canvas.mpl_connect("button_release_event", self.on_release)
+
+        # Refresh every 5s (paused while the chart can't be seen)
+        self.job = self.scheduler.register(
+            "candlestick", self.update_graph, 5000, priority=1,
+            widget=self.canvas.get_tk_widget()
+        )
+
+        # Initial draw, from the candles saved last time if there are any
+        self.show_cached()
         self.update_graph()
 
 
-    def timestamp_format(self, timestamp_ms):
-        '''Convert Binance millisecond timestamp into Hours:Minutes format'''
-        return datetime.datetime.fromtimestamp(timestamp_ms / 1000).strftime("%H:%M")
+    def show_cached(self):
+        '''Draw the saved candles for the current currency (marked stale)'''
+        if self.snapshot is None:
+            return
+
+        cached = self.snapshot.get_cached("candles", self.currency)
+        # Snapshots from before the pyramid hold hourly candles, which
+        # would be taken for 1 minute ones
+        if cached and cached.get("interval") == "1m":
+            try:
+                self.pyramid = OHLCPyramid(klines_to_arrays(cached["klines"]))
+                self.render(stale=True)
+            except (TypeError, ValueError, IndexError):
+                pass
+
+
+    def timestamp_format(self, timestamp_ms, pos=None):
+        '''Binance millisecond timestamp -> label detailed enough for the
+        current zoom'''
+        time = datetime.datetime.fromtimestamp(timestamp_ms / 1000)
+        if self.view_span <= 2 * DAY_MS:
+            return time.strftime("%H:%M")
+        if self.view_span <= 120 * DAY_MS:
+            return time.strftime("%d %b")
+        return time.strftime("%b %Y")
 
 
     def update_graph(self):
-        '''Core update loop'''
+        '''Core update (run periodically by the scheduler)'''
         # Stop if inactive
         if not self.is_active:
             return
 
-        # Cancel previous timer (avoid bugs)
-        if self.after_id:
-            self.parent_frame.after_cancel(self.after_id)
+        # History loaded in the background since the last refresh
+        pending = self.pending_pyramid
+        if pending is not None and pending[0] == self.generation:
+            self.pyramid = pending[1]
+            self.pending_pyramid = None
+
+        # Collector gone, keep its candles up but greyed out
+        if self.feed is not None and not self.feed.alive:
+            self.render(stale=True)
+            raise ConnectionError("the collector stopped updating the shared feed")
+
+        # Errors (timeouts, rate limit bodies, ...) are left to the
+        # scheduler, which backs the job off while they last. Requests run
+        # right here, so slow ones back it off too (the orderbook's run on
+        # an executor and report their time instead)
+        if not self.is_live:
+            # Newest page first, older pages follow in the background
+            self.pyramid = OHLCPyramid(klines_to_arrays(self.fetch_candles(PAGE_SIZE)))
+            self.is_live = True
+            # Attached dashboards only show what the collector publishes,
+            # so N windows still cost one set of exchange requests
+            if self.feed is None:
+                self.start_history_loader()
+        elif self.feed is not None:
+            # The feed's whole (short) history, it may have grown since
+            self.pyramid.merge(klines_to_arrays(self.fetch_candles(PAGE_SIZE)))
+        else:
+            self.catch_up()
+        self.render()
+
+
+    def fetch_candles(self, limit):
+        '''Latest limit 1 minute candles'''
+        if self.feed is not None:
+            response = self.feed.candles(self.currency)[-limit:]
+            if not response:
+                raise LookupError(f"no {self.currency} candles in the shared feed")
+            return response
+        return self.venue.fetch_klines(self.currency, "1m", limit)
+
+
+    def catch_up(self):
+        '''Merge every candle from the newest stored one on
+
+        The job doesn't run while the chart is hidden or backed off, and a
+        pyramid from the history loader only holds the candles seen at its
+        handover, so this can be more than the live candle. Pages forward
+        until a short page (the live candle is in it).
+        '''
+        since = self.pyramid.span()[1]
+        while True:
+            page = klines_to_arrays(self.venue.fetch_klines(
+                self.currency, "1m", PAGE_SIZE, start_time=since))
+            self.pyramid.merge(page)
+            if len(page["t"]) < PAGE_SIZE or page["t"][-1] <= since:
+                return
+            since = int(page["t"][-1])
+
+
+    def start_history_loader(self):
+        '''Page backwards through history_days of 1 minute candles'''
+        self.generation += 1
+        threading.Thread(
+            target=self.load_history,
+            args=(self.generation, self.currency, self.pyramid),
+            daemon=True, name="candle-history"
+        ).start()
+
+
+    def load_history(self, generation, currency, pyramid):
+        '''History loader thread, no Tk calls in here
+
+        Every few pages a bigger pyramid (older pages + everything the live
+        one holds by then) is handed over through pending_pyramid.
+        '''
+        span = pyramid.span()
+        if span is None:
+            return
 
-        # Fetch data
-        url = "https://api.binance.com/api/v3/klines"
-        params = {
-            "symbol": self.currency,
-            "interval": "1h",
-            "limit": 24
-        }
+        oldest = span[0]
+        target = oldest - self.history_days * DAY_MS
+        pages = []
+
+        while oldest > target and generation == self.generation:
+            try:
+                page = klines_to_arrays(self.venue.fetch_klines(
+                    currency, "1m", PAGE_SIZE, end_time=oldest - 1))
+            except Exception as err:
+                print(f"[Candlestick] History {currency} failed: {err}")
+                break
+
+            # Nothing older (e.g. the listing date)
+            if len(page["t"]) == 0 or page["t"][0] >= oldest:
+                break
+
+            pages.insert(0, page)
+            oldest = int(page["t"][0])
+
+            # About a week of minutes per handover
+            if len(pages) % 10 == 0:
+                self.hand_over(generation, pages, pyramid)
+
+        if pages and generation == self.generation:
+            self.hand_over(generation, pages, pyramid)
+
+
+    def hand_over(self, generation, pages, pyramid):
+        '''Build a pyramid from the loaded pages plus the live one's
+        candles for update_graph to swap in'''
+        live = self.pyramid.base_copy()
+        older = {key: np.concatenate([page[key] for page in pages]) for key in FIELDS}
+
+        # Pages handed over before are in the live pyramid already
+        if len(live["t"]):
+            keep = older["t"] < live["t"][0]
+            older = {key: older[key][keep] for key in FIELDS}
 
-        try:
-            response = requests.get(url, params=params, timeout=5).json()
-        except Exception:
-            self.after_id = self.parent_frame.after(5000, self.update_graph)
+        arrays = {key: np.concatenate([older[key], live[key]]) for key in FIELDS}
+        if generation == self.generation:
+            self.pending_pyramid = (generation, OHLCPyramid(arrays))
+
+
+    def candle_budget(self):
+        '''At most one candle per px_per_candle pixels of chart width'''
+        if self.max_candles:
+            return self.max_candles
+        width = self.ax_price.bbox.width
+        return max(20, int(width / self.px_per_candle))
+
+
+    def visible_range(self):
+        '''(start, end) of the viewport in ms'''
+        if self.view_end is None:
+            span = self.pyramid.span()
+            end = (span[1] if span else 0) + MINUTE_MS
+        else:
+            end = self.view_end
+        return end - self.view_span, end
+
+
+    def set_view(self, start, end):
+        '''Move the viewport, clamped to the loaded history'''
+        span = self.pyramid.span()
+        if span is None:
             return
 
-        timestamps = np.array([int(c[0]) for c in response])
-        opens = np.array([float(c[1]) for c in response])
-        highs = np.array([float(c[2]) for c in response])
-        lows = np.array([float(c[3]) for c in response])
-        closes = np.array([float(c[4]) for c in response])
-        volumes = np.array([float(c[5]) for c in response])
+        first, last = span[0], span[1] + MINUTE_MS
+        length = min(max(end - start, MIN_SPAN_MS), max(last - first, MIN_SPAN_MS))
+        end = min(max(end, first + length), last)
 
-        time_labels = [self.timestamp_format(t) for t in timestamps]
+        self.view_span = length
+        # Back at the newest candle, follow the live data again
+        self.view_end = None if end >= last else end
+        self.render(stale=not self.is_live)
 
-        # PRICE AXIS
-        self.ax_price.clear()
-        self.ax_price.set_facecolor("#1e1e1e")
-        self.ax_price.set_title(f"{self.displaytext} 1H Candlestick", color="white")
-        self.ax_price.set_ylabel("Price", color="white")
 
-        for i in range(len(opens)):
-            color = "#00bf63" if closes[i] >= opens[i] else "#ff4d4d"
+    def on_scroll(self, event):
+        '''Zoom around the mouse'''
+        if event.inaxes is None or event.xdata is None:
+            return
 
-            self.ax_price.plot([i, i], [lows[i], highs[i]], color=color, linewidth=1)
-            self.ax_price.add_patch(
-                matplotlib.patches.Rectangle(
-                    (i - 0.3, min(opens[i], closes[i])),
-                    0.6,
-                    abs(closes[i] - opens[i]),
-                    color=color
-                )
-            )
+        factor = 0.8 if event.button == "up" else 1.25
+        start, end = self.visible_range()
+        anchor = event.xdata
+        self.set_view(anchor - (anchor - start) * factor,
+                      anchor + (end - anchor) * factor)
 
-        self.ax_price.tick_params(axis="x", labelbottom=False, colors="white")
-        self.ax_price.tick_params(axis="y", colors="white")
 
-        # VOLUME AXIS
-        self.ax_volume.clear()
-        self.ax_volume.set_facecolor("#1e1e1e")
-        self.ax_volume.bar(range(len(volumes)), volumes, color="#5c7cfa", width=0.6)
-        self.ax_volume.set_ylabel("Volume", color="white")
+    def on_press(self, event):
+        if event.button == 1 and event.inaxes is not None:
+            self.drag_from = (event.x, *self.visible_range())
 
-        self.ax_volume.set_xticks(range(len(time_labels)))
-        self.ax_volume.set_xticklabels(time_labels, rotation=45, ha="right", color="white")
-        self.ax_volume.tick_params(axis="y", colors="white")
 
-        # Style
-        for ax in (self.ax_price, self.ax_volume):
-            ax.grid(True, linestyle="--", alpha=0.15)
-            for spine in ax.spines.values():
-                spine.set_visible(False)
+    def on_drag(self, event):
+        '''Pan by the mouse's pixel offset since the press'''
+        if self.drag_from is None or event.x is None:
+            return
+
+        x, start, end = self.drag_from
+        ms_per_px = (end - start) / self.ax_price.bbox.width
+        shift = (x - event.x) * ms_per_px
+        self.set_view(start + shift, end + shift)
+
+
+    def on_release(self, event):
+        self.drag_from = None
+
+
+    def render(self, stale=False):
+        '''Draw the viewport from the pyramid'''
+        if self.pyramid.span() is None:
+            return
+
+        start, end = self.visible_range()
+        minutes, candles = self.pyramid.view(start, end, self.candle_budget())
+
+        opens, highs = candles["o"], candles["h"]
+        lows, closes = candles["l"], candles["c"]
+        volumes = candles["v"]
+
+        # PRICE AXIS
+        title = f"{self.displaytext} {LEVEL_NAMES[minutes]} Candlestick"
+        self.ax_price.set_title(title + (" (stale)" if stale else ""),
+                                color="#a0a6ad" if stale else "white")
+
+        # Candles are centred in their interval, x is in ms
+        width = minutes * MINUTE_MS
+        x = candles["t"] + width / 2
+        left = x - width * 0.3
+        right = x + width * 0.3
+        bottoms = np.minimum(opens, closes)
+        tops = np.maximum(opens, closes)
+
+        colors = np.where((closes >= opens)[:, None],
+                          to_rgba("#00bf63"), to_rgba("#ff4d4d"))
+
+        # Wick segments (n, 2, 2) and body rectangles (n, 4, 2)
+        self.wicks.set_segments(np.stack([
+            np.column_stack([x, lows]), np.column_stack([x, highs])
+        ], axis=1))
+        self.wicks.set_colors(colors)
+
+        self.bodies.set_verts(np.stack([
+            np.column_stack([left, bottoms]), np.column_stack([left, tops]),
+            np.column_stack([right, tops]), np.column_stack([right, bottoms])
+        ], axis=1))
+        self.bodies.set_facecolors(colors)
+
+        # VOLUME AXIS
+        zeros = np.zeros(len(volumes))
+        self.volume_bars.set_verts(np.stack([
+            np.column_stack([left, zeros]), np.column_stack([left, volumes]),
+            np.column_stack([right, volumes]), np.column_stack([right, zeros])
+        ], axis=1))
+
+        # Collections don't autoscale, so set the limits by hand
+        self.ax_price.set_xlim(start, end)
+        if len(opens):
+            padding = (highs.max() - lows.min()) * 0.05 or highs.max() * 0.01
+            self.ax_price.set_ylim(lows.min() - padding, highs.max() + padding)
+            self.ax_volume.set_ylim(0, volumes.max() * 1.05 or 1)
 
         self.canvas.draw_idle()
 
-        # Schedule next update
-        self.after_id = self.parent_frame.after(5000, self.update_graph)
+
+    def save_candles(self):
+        '''Keep the last day of 1 minute candles for the next startup'''
+        if self.snapshot is None or not self.is_live:
+            return
+
+        # Only this thread writes the pyramid, no copy needed
+        base = self.pyramid.base.arrays()
+        rows = np.column_stack([base[key][-1440:] for key in FIELDS])
+        self.snapshot.data["candles"] = {
+            "symbol": self.currency,
+            "interval": "1m",
+            "klines": [[int(row[0]), *row[1:].tolist()] for row in rows]
+        }
 
 
     def start(self):
@@ -144,16 +457,16 @@ class Candlestickchart:
         self.is_active = True
         # Print out the status
         print(f"[Candlestick] Connected ({self.currency})")
-        self.update_graph()
+        # First fetch runs on the next scheduler tick, so the window (and
+        # any cached candles) is drawn before the first request
+        self.job.resume()
 
 
     def stop(self):
         '''Stops live updating, also for debugging'''
         self.is_active = False
-
-        if self.after_id:
-            self.parent_frame.after_cancel(self.after_id)
-            self.after_id = None
+        self.job.pause()
+        self.save_candles()
         # Print out the status
         print("[Candlestick] Disconnected")
 
@@ -161,8 +474,16 @@ class Candlestickchart:
     def switch_graph(self, new_currency, new_displaytext):
         '''Switch graph to another currency (used for button command)'''
         self.stop()
+        # Cancel the old currency's history loader
+        self.generation += 1
+        self.pending_pyramid = None
+        self.pyramid = OHLCPyramid()
+        self.is_live = False
+        self.view_span = DEFAULT_SPAN_MS
+        self.view_end = None
+
         self.currency = new_currency
         self.displaytext = new_displaytext
         self.label.configure(text=f"Showing {self.displaytext}")
+        self.show_cached()
         self.start()
-
@@ -0,0 +1,89 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import heapq
+from collections import Counter
+from itertools import islice
+
+#-----------------------------------------------------------------------------#
+
+
+class ConsolidatedBook:
+    '''Order book consolidated across venues
+
+    Each venue's bids and asks are kept sorted (best first) and tagged with
+    the venue when they come in. The consolidated top levels are a
+    heap-based k-way merge (heapq.merge) over those per-venue lists. When
+    one venue changes only its levels are replaced: the other venues'
+    levels already merged stay, and the merge picks up after them.
+    '''
+
+    def __init__(self):
+        # venue tag -> (bids, asks), levels as (price, qty, tag)
+        self.books = {}
+        # depth -> (bids, asks), kept up to date venue by venue
+        self.merged = {}
+
+
+    def update_venue(self, tag, bids, asks):
+        '''Replace one venue's book, returns False if nothing changed'''
+        book = (
+            [(price, qty, tag) for price, qty in bids],
+            [(price, qty, tag) for price, qty in asks]
+        )
+        if self.books.get(tag) == book:
+            return False
+
+        self.books[tag] = book
+        self.remerge(tag)
+        return True
+
+
+    def remove_venue(self, tag):
+        '''Drop a venue (e.g. when it stops responding)'''
+        if self.books.pop(tag, None) is not None:
+            self.remerge(tag)
+
+
+    def remerge(self, tag):
+        '''Swap one venue's levels in every cached merge'''
+        for depth, (bids, asks) in self.merged.items():
+            self.merged[depth] = (self.replace_levels(bids, tag, 0, depth),
+                                  self.replace_levels(asks, tag, 1, depth))
+
+
+    def replace_levels(self, merged, tag, side, depth):
+        '''merged with tag's levels swapped for its current book
+
+        Every other venue's merged levels are a prefix of its unchanged
+        book, so merging them with the changed venue's book and the rest
+        of the other books gives the same result as a full merge.
+        '''
+        key = (lambda level: -level[0]) if side == 0 else (lambda level: level[0])
+        kept = [level for level in merged if level[2] != tag]
+        used = Counter(level[2] for level in kept)
+
+        rest = [book[side][used[other]:] for other, book in self.books.items()
+                if other != tag]
+        changed = self.books[tag][side] if tag in self.books else []
+
+        return list(islice(heapq.merge(kept, changed, *rest, key=key), depth))
+
+
+    def clear(self):
+        '''Drop every venue (used when switching currency)'''
+        self.books.clear()
+        self.merged.clear()
+
+
+    def top(self, depth):
+        '''Best depth bids (highest first) and asks (lowest first)'''
+        if depth not in self.merged:
+            bids = heapq.merge(*(b for b, _ in self.books.values()),
+                               key=lambda level: -level[0])
+            asks = heapq.merge(*(a for _, a in self.books.values()),
+                               key=lambda level: level[0])
+            # islice stops the merge after depth levels
+            self.merged[depth] = (list(islice(bids, depth)),
+                                  list(islice(asks, depth)))
+        return self.merged[depth]
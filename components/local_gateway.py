@@ -0,0 +1,355 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import json
+import time
+import base64
+import struct
+import asyncio
+import hashlib
+import threading
+
+#-----------------------------------------------------------------------------#
+
+GATEWAY_PORT = 8765
+
+# RFC 6455 handshake constant
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Websocket opcodes
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Clients only send control frames, anything bigger is dropped
+MAX_CLIENT_FRAME = 4096
+
+
+def encode(message):
+    '''Compact JSON text'''
+    return json.dumps(message, separators=(",", ":"))
+
+
+def ws_frame(opcode, payload):
+    '''One unmasked (server to client) websocket frame'''
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 2**16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class GatewayClient:
+    '''One websocket consumer and the messages queued for it'''
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.sender = None
+        self.peer = writer.get_extra_info("peername")
+
+
+class LocalGateway:
+    '''Local HTTP + websocket server re-broadcasting what the dashboard
+    receives, so other tools don't open their own exchange connections
+
+    State is a dict of key -> fields ("ticker:BTCUSDT" -> price, change,
+    percent; "book:BTCUSDT" -> bid0.., ask0.. levels), each with ts, the
+    time of its last update in ms. Keys are removed when their ticker is
+    toggled off or the book switches currency. publish() and remove() can
+    be called from any thread. Websocket clients on /stream get the whole
+    state once, then only the fields that changed and removed keys, each
+    message with the next sequence number. Every client has its own
+    bounded queue, a client that lets it fill up is disconnected instead
+    of holding up the others. GET /snapshot and /health serve plain JSON.
+    '''
+
+    def __init__(self, host="127.0.0.1", port=GATEWAY_PORT, queue_size=256):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+
+        # Only touched from the gateway's event loop
+        self.state = {}
+        self.seq = 0
+        self.clients = set()
+        self.dropped = 0
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+
+    def start(self):
+        '''Start serving on a background thread, raises OSError if the
+        port can't be bound'''
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        error = []
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(asyncio.start_server(
+                    self.handle_connection, self.host, self.port))
+            except OSError as err:
+                error.append(err)
+                started.set()
+                self.loop.close()
+                return
+
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True,
+                                       name="local-gateway")
+        self.thread.start()
+        started.wait()
+
+        if error:
+            self.thread = None
+            raise error[0]
+        print(f"[Gateway] Serving on http://{self.host}:{self.port}")
+
+
+    def stop(self):
+        '''Disconnect every client and stop the server'''
+        if self.thread is None:
+            return
+
+        future = asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+        try:
+            future.result(timeout=2)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+        self.thread = None
+        print("[Gateway] Stopped")
+
+
+    async def shutdown(self):
+        self.server.close()
+        for client in list(self.clients):
+            self.drop(client)
+        await self.server.wait_closed()
+
+
+    #-------------------------------------------------------------------------#
+    # Publishing (any thread)
+
+    def publish(self, key, fields):
+        '''Replace key's fields, clients get whatever changed'''
+        if self.thread is not None:
+            fields = dict(fields, ts=int(time.time() * 1000))
+            self.loop.call_soon_threadsafe(self.apply, key, fields)
+
+
+    def remove(self, key):
+        '''Drop key (it is no longer updated), clients get a remove'''
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.apply_remove, key)
+
+
+    def publish_tick(self, symbol, price, change, percent):
+        '''CryptoTicker listener'''
+        self.publish(f"ticker:{symbol}", {
+            "price": price, "change": change, "percent": percent
+        })
+
+
+    def publish_book(self, symbol, bids, asks):
+        '''OrderBookPanel listener, (price, qty, venue tag) levels'''
+        fields = {f"bid{i}": [float(p), float(q), tag]
+                  for i, (p, q, tag) in enumerate(bids)}
+        fields.update({f"ask{i}": [float(p), float(q), tag]
+                       for i, (p, q, tag) in enumerate(asks)})
+        self.publish(f"book:{symbol}", fields)
+
+
+    def remove_tick(self, symbol):
+        '''CryptoTicker stop listener'''
+        self.remove(f"ticker:{symbol}")
+
+
+    def remove_book(self, symbol):
+        '''OrderBookPanel stop listener'''
+        self.remove(f"book:{symbol}")
+
+
+    def apply(self, key, fields):
+        '''Update the state and queue the delta (event loop only)'''
+        old = self.state.get(key, {})
+        changed = {name: value for name, value in fields.items()
+                   if old.get(name) != value}
+        # Fields that are gone (e.g. a thinner book) are sent as null
+        changed.update({name: None for name in old if name not in fields})
+        # ts changes on every publish, so even an unchanged key sends a
+        # delta and clients can tell it is still live
+        self.state[key] = fields
+        self.broadcast({"type": "delta", "key": key, "fields": changed})
+
+
+    def apply_remove(self, key):
+        '''Drop key from the state and tell the clients (event loop only)'''
+        if self.state.pop(key, None) is None:
+            return
+        self.broadcast({"type": "remove", "key": key})
+
+
+    def broadcast(self, message):
+        '''Number one message and queue it for every client (event loop
+        only)'''
+        self.seq += 1
+        message = encode(dict(message, seq=self.seq))
+
+        for client in list(self.clients):
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up, don't let it hold the others back
+                print(f"[Gateway] Dropped slow client {client.peer}")
+                self.drop(client)
+
+
+    def drop(self, client):
+        '''Disconnect a client (event loop only)'''
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        self.dropped += 1
+        if client.sender:
+            client.sender.cancel()
+        client.writer.close()
+
+
+    #-------------------------------------------------------------------------#
+    # HTTP
+
+    async def handle_connection(self, reader, writer):
+        '''Route one connection: /snapshot, /health or the /stream websocket'''
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            method, path, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError, ConnectionError):
+            writer.close()
+            return
+
+        path = path.split("?", 1)[0]
+
+        if method != "GET":
+            await self.respond(writer, 405, {"error": "only GET is supported"})
+        elif path == "/stream" and headers.get("upgrade", "").lower() == "websocket":
+            await self.stream(reader, writer, headers)
+        elif path == "/snapshot":
+            await self.respond(writer, 200, {"seq": self.seq, "state": self.state})
+        elif path == "/health":
+            await self.respond(writer, 200, {
+                "seq": self.seq, "keys": len(self.state),
+                "clients": len(self.clients), "dropped": self.dropped
+            })
+        else:
+            await self.respond(writer, 404, {"error": f"no such path {path}"})
+
+
+    async def respond(self, writer, status, body):
+        '''Plain JSON response, then close'''
+        reasons = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}
+        payload = encode(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+    #-------------------------------------------------------------------------#
+    # Websocket
+
+    async def stream(self, reader, writer, headers):
+        '''Websocket handshake, snapshot, then deltas until either side
+        closes'''
+        key = headers.get("sec-websocket-key")
+        if not key:
+            writer.close()
+            return
+
+        accept = base64.b64encode(
+            hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+
+        client = GatewayClient(writer, self.queue_size)
+        # Snapshot goes in first, every later delta has a higher seq
+        client.queue.put_nowait(encode({"type": "snapshot", "seq": self.seq,
+                                        "state": self.state}))
+        self.clients.add(client)
+        client.sender = asyncio.create_task(self.send_loop(client))
+
+        try:
+            await self.receive_loop(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if client in self.clients:
+                self.clients.discard(client)
+                client.sender.cancel()
+                writer.close()
+
+
+    async def send_loop(self, client):
+        '''Write the client's queued messages as they come'''
+        try:
+            while True:
+                message = await client.queue.get()
+                client.writer.write(ws_frame(OP_TEXT, message.encode()))
+                await client.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+    async def receive_loop(self, reader, writer):
+        '''Answer pings and closes, returns when the client goes away'''
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if length > MAX_CLIENT_FRAME:
+                return
+
+            # Client frames are always masked
+            mask = await reader.readexactly(4) if second & 0x80 else b"\0" * 4
+            payload = bytes(b ^ mask[i % 4] for i, b in
+                            enumerate(await reader.readexactly(length)))
+
+            if opcode == OP_CLOSE:
+                writer.write(ws_frame(OP_CLOSE, payload[:2]))
+                return
+            if opcode == OP_PING:
+                writer.write(ws_frame(OP_PONG, payload))
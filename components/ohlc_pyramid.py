@@ -0,0 +1,194 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import threading
+import numpy as np
+
+#-----------------------------------------------------------------------------#
+
+# Minutes per candle at each level of detail
+LEVELS = (1, 5, 15, 60, 240, 1440, 4320, 10080)
+LEVEL_NAMES = {1: "1m", 5: "5m", 15: "15m", 60: "1h", 240: "4h",
+               1440: "1D", 4320: "3D", 10080: "1W"}
+
+FIELDS = ("t", "o", "h", "l", "c", "v")
+
+# Bucket start offsets from the Unix epoch (a Thursday 00:00 UTC). Weeks
+# start on Monday like Binance's 1w. Binance counts 3d candles from the
+# epoch day, so 3D (like every shorter level) has no offset.
+ALIGN_MS = {10080: 4 * 1440 * 60000, 4320: 0}
+
+
+def bucket_start(time_ms, minutes):
+    '''Open time of the minutes-long candle holding time_ms'''
+    width = minutes * 60000
+    offset = ALIGN_MS.get(minutes, 0)
+    return (time_ms - offset) // width * width + offset
+
+
+def empty_arrays():
+    arrays = {key: np.empty(0) for key in FIELDS}
+    arrays["t"] = np.empty(0, dtype=np.int64)
+    return arrays
+
+
+def klines_to_arrays(klines):
+    '''Binance style [open time, o, h, l, c, v, ...] rows -> numpy arrays'''
+    if len(klines) == 0:
+        return empty_arrays()
+
+    rows = np.array([k[:6] for k in klines], dtype=float)
+    arrays = {key: rows[:, i] for i, key in enumerate(FIELDS)}
+    arrays["t"] = arrays["t"].astype(np.int64)
+    return arrays
+
+
+def sort_unique(arrays):
+    '''Sort by time, keeping the last of any duplicate minute'''
+    t = arrays["t"]
+    if len(t) < 2 or np.all(np.diff(t) > 0):
+        return arrays
+
+    order = np.argsort(t, kind="stable")
+    sorted_t = t[order]
+    keep = order[np.r_[sorted_t[1:] != sorted_t[:-1], True]]
+    return {key: arrays[key][keep] for key in FIELDS}
+
+
+def aggregate(base, minutes):
+    '''Aggregate 1 minute candles into minutes-long candles (aligned as
+    in ALIGN_MS)'''
+    if minutes == 1 or len(base["t"]) == 0:
+        return {key: base[key].copy() for key in FIELDS}
+
+    opens = bucket_start(base["t"], minutes)
+    starts = np.flatnonzero(np.r_[True, opens[1:] != opens[:-1]])
+    ends = np.r_[starts[1:], len(opens)] - 1
+
+    return {
+        "t": opens[starts],
+        "o": base["o"][starts],
+        "h": np.maximum.reduceat(base["h"], starts),
+        "l": np.minimum.reduceat(base["l"], starts),
+        "c": base["c"][ends],
+        "v": np.add.reduceat(base["v"], starts)
+    }
+
+
+class Columns:
+    '''OHLCV columns in growable buffers, so replacing the last few rows
+    doesn't copy the whole history'''
+
+    def __init__(self, arrays):
+        self.n = len(arrays["t"])
+        capacity = max(1024, self.n * 2)
+        self.buffers = {}
+        for key in FIELDS:
+            self.buffers[key] = np.empty(capacity, dtype=arrays[key].dtype)
+            self.buffers[key][:self.n] = arrays[key]
+
+
+    def arrays(self):
+        '''Views of the filled part (no copies)'''
+        return {key: self.buffers[key][:self.n] for key in FIELDS}
+
+
+    def replace_tail(self, cut, tail):
+        '''Keep rows [:cut] and write tail after them'''
+        end = cut + len(tail["t"])
+        capacity = len(self.buffers["t"])
+
+        if end > capacity:
+            capacity = max(end, capacity * 2)
+            for key in FIELDS:
+                grown = np.empty(capacity, dtype=self.buffers[key].dtype)
+                grown[:cut] = self.buffers[key][:cut]
+                self.buffers[key] = grown
+
+        for key in FIELDS:
+            self.buffers[key][cut:end] = tail[key]
+        self.n = end
+
+
+class OHLCPyramid:
+    '''Multi-resolution OHLCV history built from 1 minute candles
+
+    Every level in LEVELS is precomputed, so any time range can be drawn
+    from the finest level that still fits a candle budget. Merging new
+    candles only recomputes the buckets from the first changed minute on,
+    so updating the live candle stays cheap with a year of history.
+    '''
+
+    def __init__(self, arrays=None):
+        # Guards the base columns, the history loader copies them from
+        # another thread
+        self.lock = threading.Lock()
+        base = sort_unique(arrays if arrays is not None else empty_arrays())
+        self.base = Columns(base)
+        self.levels = {minutes: Columns(aggregate(base, minutes))
+                       for minutes in LEVELS}
+
+
+    def __len__(self):
+        return self.base.n
+
+
+    def span(self):
+        '''(first, last) candle open time in ms, None if empty'''
+        if self.base.n == 0:
+            return None
+        t = self.base.buffers["t"]
+        return int(t[0]), int(t[self.base.n - 1])
+
+
+    def base_copy(self):
+        '''Consistent copy of the 1 minute arrays (safe from other threads)'''
+        with self.lock:
+            return {key: value.copy() for key, value in self.base.arrays().items()}
+
+
+    def merge(self, arrays):
+        '''Add or update 1 minute candles (newer ones win)'''
+        if len(arrays["t"]) == 0:
+            return
+
+        first_new = int(arrays["t"].min())
+
+        with self.lock:
+            base = self.base.arrays()
+            cut = int(np.searchsorted(base["t"], first_new))
+            tail = sort_unique({key: np.concatenate([base[key][cut:], arrays[key]])
+                                for key in FIELDS})
+            self.base.replace_tail(cut, tail)
+
+        self._rebuild_from(first_new)
+
+
+    def _rebuild_from(self, time_ms):
+        '''Recompute every level's buckets from the one holding time_ms'''
+        base = self.base.arrays()
+
+        for minutes in LEVELS:
+            first = bucket_start(time_ms, minutes)
+
+            level = self.levels[minutes]
+            level_cut = int(np.searchsorted(level.arrays()["t"], first))
+            base_cut = int(np.searchsorted(base["t"], first))
+
+            fresh = aggregate({key: base[key][base_cut:] for key in FIELDS}, minutes)
+            level.replace_tail(level_cut, fresh)
+
+
+    def view(self, start_ms, end_ms, max_candles):
+        '''Candles overlapping [start_ms, end_ms] from the finest level
+        with at most max_candles of them there
+
+        Returns (minutes, arrays), arrays being views into that level.
+        '''
+        for minutes in LEVELS:
+            level = self.levels[minutes].arrays()
+            # Include the candle that started before start_ms
+            lo = np.searchsorted(level["t"], start_ms - minutes * 60000, side="right")
+            hi = np.searchsorted(level["t"], end_ms, side="right")
+            if hi - lo <= max_candles or minutes == LEVELS[-1]:
+                return minutes, {key: level[key][lo:hi] for key in FIELDS}
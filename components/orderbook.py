@@ -1,22 +1,57 @@
 #-----------------------------------------------------------------------------#
 # Modules
 
+import time
 import tkinter as tk
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from components.venues import BinanceVenue
+from components.consolidated_book import ConsolidatedBook
 
 #-----------------------------------------------------------------------------#
 
 
 class OrderBookPanel:
-    '''OrderBook class'''
+    '''OrderBook class (consolidated over one or more venues)'''
 
-    def __init__(self, parent, currency="BTCUSDT"):
+    def __init__(self, parent, scheduler, currency="BTCUSDT", snapshot=None,
+                 rows=10, venues=None):
         self.parent = parent
         self.currency = currency
-        self.after_id = None
+        # Number of BID/ASK levels shown
+        self.rows = rows
+
+        # Venue adapters the book is merged from (Binance only by default)
+        self.venues = venues or [BinanceVenue()]
+        self.book = ConsolidatedBook()
+        # Exchange venues are fetched in parallel off the Tk thread, so a
+        # slow venue never freezes the window. Local venues (shared feed,
+        # stand-ins) are only dict reads and are read right away.
+        self.remote = any(venue.remote for venue in self.venues)
+        self.executor = None
+        if self.remote:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.venues),
+                                               thread_name_prefix="venue")
+        # (currency, futures) of the fetch running in the background
+        self.in_flight = None
+        # Last live (bids, asks), greyed out while no venue responds
+        self.last_book = None
+        # Latest book is kept in here for the next startup
+        self.snapshot = snapshot
         self.is_active = False
+        # Called with (currency, bids, asks) after every live refresh
+        self.listeners = []
+        # Called with (currency) when that currency's book stops updating
+        self.stop_listeners = []
 
         self._build_ui()
+
+        # Refresh every 3s (paused while the book can't be seen)
+        self.job = scheduler.register(
+            "orderbook", self.update_orderbook, 3000, priority=2,
+            widget=self.container
+        )
+        self.show_cached()
         self.start()
 
 
@@ -46,11 +81,13 @@ class OrderBookPanel:
 
         # Column layout
         # (This is only added so the side titles align with data frame)
-        self.side_titles.columnconfigure(0, weight=1)
+        self.side_titles.columnconfigure(0, weight=0)
         self.side_titles.columnconfigure(1, weight=1)
-        self.side_titles.columnconfigure(2, weight=0)
-        self.side_titles.columnconfigure(3, weight=1)
+        self.side_titles.columnconfigure(2, weight=1)
+        self.side_titles.columnconfigure(3, weight=0)
         self.side_titles.columnconfigure(4, weight=1)
+        self.side_titles.columnconfigure(5, weight=1)
+        self.side_titles.columnconfigure(6, weight=0)
 
         # BIDs Title
         tk.Label(
@@ -59,7 +96,7 @@ class OrderBookPanel:
             fg="#00bf63",
             bg="#1e1e1e",
             font=("Helvetica", 10, "bold")
-        ).grid(row=0, column=0, columnspan=2, sticky="w", padx=6)
+        ).grid(row=0, column=0, columnspan=3, sticky="w", padx=6)
 
         # ASKs Title
         tk.Label(
@@ -68,7 +105,7 @@ class OrderBookPanel:
             fg="#ff4d4d",
             bg="#1e1e1e",
             font=("Helvetica", 10, "bold")
-        ).grid(row=0, column=3, columnspan=2, sticky="w", padx=6)
+        ).grid(row=0, column=4, columnspan=3, sticky="w", padx=6)
 
 
         # DATA FRAME
@@ -76,11 +113,13 @@ class OrderBookPanel:
         self.data_frame.pack(fill="both", expand=True, pady=4)
 
         # Column layout
-        self.data_frame.columnconfigure(0, weight=1)  # BIDs price
-        self.data_frame.columnconfigure(1, weight=1)  # BIDs quantity
-        self.data_frame.columnconfigure(2, weight=0)  # Divider
-        self.data_frame.columnconfigure(3, weight=1)  # ASKs price
-        self.data_frame.columnconfigure(4, weight=1)  # ASKs quantity
+        self.data_frame.columnconfigure(0, weight=0)  # BIDs venue
+        self.data_frame.columnconfigure(1, weight=1)  # BIDs price
+        self.data_frame.columnconfigure(2, weight=1)  # BIDs quantity
+        self.data_frame.columnconfigure(3, weight=0)  # Divider
+        self.data_frame.columnconfigure(4, weight=1)  # ASKs price
+        self.data_frame.columnconfigure(5, weight=1)  # ASKs quantity
+        self.data_frame.columnconfigure(6, weight=0)  # ASKs venue
 
         # COLUMN HEADERS
         header_style = {
@@ -91,30 +130,34 @@ class OrderBookPanel:
 
         # BIDs price & quantities header
         tk.Label(self.data_frame, text="Price", **header_style)\
-            .grid(row=0, column=0, sticky="w", padx=6)
+            .grid(row=0, column=1, sticky="w", padx=6)
         tk.Label(self.data_frame, text="Quantity", **header_style)\
-            .grid(row=0, column=1, sticky="e", padx=6)
+            .grid(row=0, column=2, sticky="e", padx=6)
 
         # ASKs price & quantity header
         tk.Label(self.data_frame, text="Price", **header_style)\
-            .grid(row=0, column=3, sticky="w", padx=6)
+            .grid(row=0, column=4, sticky="w", padx=6)
         tk.Label(self.data_frame, text="Quantity", **header_style)\
-            .grid(row=0, column=4, sticky="e", padx=6)
+            .grid(row=0, column=5, sticky="e", padx=6)
 
         # Create the vertical divider
         divider = tk.Frame(self.data_frame, bg="grey", width=3)
-        divider.grid(row=0, column=2, rowspan=11, sticky="ns", padx=4)
+        divider.grid(row=0, column=3, rowspan=self.rows + 1, sticky="ns", padx=4)
 
         # Order rows
+        self.bid_venue_labels = []
         self.bid_price_labels = []
         self.bid_qty_labels = []
         self.ask_price_labels = []
         self.ask_qty_labels = []
+        self.ask_venue_labels = []
 
-        # Top 10 BIDs and ASKs
-        for i in range(10):
+        # Top BIDs and ASKs
+        for i in range(self.rows):
             r = i + 1
 
+            bv = tk.Label(self.data_frame, bg="#1e1e1e", fg="#a0a6ad",
+                          font=("Consolas", 8), anchor="w")
             bp = tk.Label(self.data_frame, bg="#1e1e1e", fg="#00bf63",
                           font=("Consolas", 9), anchor="w")
             bq = tk.Label(self.data_frame, bg="#1e1e1e", fg="#cfd8dc",
@@ -124,24 +167,94 @@ class OrderBookPanel:
                           font=("Consolas", 9), anchor="w")
             aq = tk.Label(self.data_frame, bg="#1e1e1e", fg="#cfd8dc",
                           font=("Consolas", 9), anchor="e")
+            av = tk.Label(self.data_frame, bg="#1e1e1e", fg="#a0a6ad",
+                          font=("Consolas", 8), anchor="e")
 
-            bp.grid(row=r, column=0, sticky="w", padx=6)
-            bq.grid(row=r, column=1, sticky="e", padx=6)
-            ap.grid(row=r, column=3, sticky="w", padx=6)
-            aq.grid(row=r, column=4, sticky="e", padx=6)
+            bv.grid(row=r, column=0, sticky="w", padx=(6, 0))
+            bp.grid(row=r, column=1, sticky="w", padx=6)
+            bq.grid(row=r, column=2, sticky="e", padx=6)
+            ap.grid(row=r, column=4, sticky="w", padx=6)
+            aq.grid(row=r, column=5, sticky="e", padx=6)
+            av.grid(row=r, column=6, sticky="e", padx=(0, 6))
 
+            self.bid_venue_labels.append(bv)
             self.bid_price_labels.append(bp)
             self.bid_qty_labels.append(bq)
             self.ask_price_labels.append(ap)
             self.ask_qty_labels.append(aq)
+            self.ask_venue_labels.append(av)
 
 
-    def fetch_orderbook(self):
-        '''Fetch data'''
-        url = "https://api.binance.com/api/v3/depth"
-        params = {"symbol": self.currency, "limit": 10}
-        response = requests.get(url, params=params, timeout=5)
-        return response.json()
+    def show_cached(self):
+        '''Show the saved book for the current currency (greyed out)'''
+        if self.snapshot is None:
+            return
+
+        cached = self.snapshot.get_cached("orderbook", self.currency)
+        if cached:
+            try:
+                # Books saved before the venue tags were (price, qty)
+                bids, asks = ([(level[0], level[1], level[2] if len(level) > 2 else "")
+                               for level in levels]
+                              for levels in (cached["bids"], cached["asks"]))
+                self.render_book(bids, asks, stale=True)
+            except (TypeError, ValueError, IndexError, KeyError):
+                pass
+
+
+    def fetch_venue(self, venue, currency):
+        '''Fetch one venue's depth, None if the venue failed'''
+        start = time.monotonic()
+        try:
+            return venue.fetch_depth(currency, self.rows)
+        except Exception as err:
+            print(f"[OrderBook] {venue.name} failed: {err}")
+            return None
+        finally:
+            # The scheduler only times the submit and the merge, requests
+            # on the executor report their latency so slow venues still
+            # back the job off
+            if venue.remote:
+                self.job.report_runtime((time.monotonic() - start) * 1000)
+
+
+    def start_fetch(self):
+        '''Fetch every venue on the executor, the job is woken up once
+        they are all done'''
+        futures = [self.executor.submit(self.fetch_venue, venue, self.currency)
+                   for venue in self.venues]
+        self.in_flight = (self.currency, futures)
+        for future in futures:
+            future.add_done_callback(self.on_fetched)
+
+
+    def on_fetched(self, future):
+        '''Executor thread, no Tk calls: run the job on the next tick'''
+        in_flight = self.in_flight
+        if self.is_active and in_flight and all(f.done() for f in in_flight[1]):
+            self.job.resume()
+
+
+    def merge_results(self, results):
+        '''Merge the venues' depth into the consolidated book'''
+        for venue, depth in zip(self.venues, results):
+            if depth is None:
+                # Don't keep showing liquidity from a venue that went quiet
+                self.book.remove_venue(venue.tag)
+            else:
+                self.book.update_venue(venue.tag, *depth)
+
+        if not self.book.books:
+            raise ConnectionError("no venue responded")
+        return self.book.top(self.rows)
+
+
+    def add_listener(self, callback, on_stop=None):
+        '''Also pass every live book on to callback (e.g. the local gateway),
+        and tell on_stop when a currency's book stops updating'''
+        self.listeners.append(callback)
+        if on_stop is not None:
+            self.stop_listeners.append(on_stop)
 
 
     def start(self):
@@ -152,51 +265,101 @@ class OrderBookPanel:
         self.is_active = True
         # Print out status
         print(f"[OrderBook] Connected ({self.currency})")
-        self.update_orderbook()
+        # First fetch runs on the next scheduler tick, so the window is
+        # drawn first
+        self.job.resume()
 
 
     def stop(self):
         '''Stops live updating, also for debugging'''
         self.is_active = False
-
-        if self.after_id:
-            self.parent.after_cancel(self.after_id)
-            self.after_id = None
+        self.job.pause()
+        # Also on switch_currency, before the currency changes
+        for listener in self.stop_listeners:
+            listener(self.currency)
         # Print out status
         print("[OrderBook] Disconnected")
 
 
     def update_orderbook(self):
-        '''Core update loop'''
+        '''Core update (run periodically by the scheduler)'''
         if not self.is_active:
             return
 
-        if self.after_id:
-            self.parent.after_cancel(self.after_id)
-
-        try:
-            data = self.fetch_orderbook()
-            bids = data["bids"][:10]
-            asks = data["asks"][:10]
-        except Exception:
-            self.after_id = self.parent.after(3000, self.update_orderbook)
+        if not self.remote:
+            results = [self.fetch_venue(venue, self.currency)
+                       for venue in self.venues]
+        elif self.in_flight is None:
+            # Merged on the run after the fetch is done
+            self.start_fetch()
             return
-
-        for i in range(10):
-            bid_price, bid_qty = bids[i]
-            ask_price, ask_qty = asks[i]
-
-            self.bid_price_labels[i].config(text=f"{float(bid_price):,.2f}")
-            self.bid_qty_labels[i].config(text=f"{float(bid_qty):.6f}")
-
-            self.ask_price_labels[i].config(text=f"{float(ask_price):,.2f}")
-            self.ask_qty_labels[i].config(text=f"{float(ask_qty):.6f}")
-
-        self.after_id = self.parent.after(3000, self.update_orderbook)
+        else:
+            currency, futures = self.in_flight
+            if not all(future.done() for future in futures):
+                return
+            self.in_flight = None
+            # Fetched before a currency switch
+            if currency != self.currency:
+                return
+            results = [future.result() for future in futures]
+
+        # Raises when no venue responded, so the scheduler backs off
+        try:
+            bids, asks = self.merge_results(results)
+        except ConnectionError:
+            if self.last_book:
+                self.render_book(*self.last_book, stale=True)
+            raise
+
+        self.last_book = (bids, asks)
+        self.render_book(bids, asks)
+        for listener in self.listeners:
+            listener(self.currency, bids, asks)
+
+        if self.snapshot is not None:
+            self.snapshot.data["orderbook"] = {
+                "symbol": self.currency, "bids": bids, "asks": asks
+            }
+
+
+    def render_book(self, bids, asks, stale=False):
+        '''Write the top levels (price, qty, venue tag) into the labels'''
+        # Greyed out prices while showing the saved book
+        bid_color = "#a0a6ad" if stale else "#00bf63"
+        ask_color = "#a0a6ad" if stale else "#ff4d4d"
+
+        for i in range(self.rows):
+            # Fewer levels than rows (e.g. thin venues) leaves rows blank
+            if i < len(bids):
+                bid_price, bid_qty, bid_venue = bids[i]
+                self.bid_venue_labels[i].config(text=bid_venue)
+                self.bid_price_labels[i].config(text=f"{float(bid_price):,.2f}",
+                                                fg=bid_color)
+                self.bid_qty_labels[i].config(text=f"{float(bid_qty):.6f}")
+            else:
+                self.bid_venue_labels[i].config(text="")
+                self.bid_price_labels[i].config(text="")
+                self.bid_qty_labels[i].config(text="")
+
+            if i < len(asks):
+                ask_price, ask_qty, ask_venue = asks[i]
+                self.ask_price_labels[i].config(text=f"{float(ask_price):,.2f}",
+                                                fg=ask_color)
+                self.ask_qty_labels[i].config(text=f"{float(ask_qty):.6f}")
+                self.ask_venue_labels[i].config(text=ask_venue)
+            else:
+                self.ask_price_labels[i].config(text="")
+                self.ask_qty_labels[i].config(text="")
+                self.ask_venue_labels[i].config(text="")
 
 
     def switch_currency(self, new_currency):
         '''Switch orderbook to another currency (used for button command)'''
         self.stop()
         self.currency = new_currency
+        # Levels from the old currency must not be merged with the new one
+        self.book.clear()
+        self.in_flight = None
+        self.last_book = None
+        self.show_cached()
         self.start()
\ No newline at end of file
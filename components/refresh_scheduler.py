@@ -0,0 +1,203 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import time
+import random
+
+#-----------------------------------------------------------------------------#
+
+
+class RefreshJob:
+    '''One periodic job registered with the RefreshScheduler'''
+
+    def __init__(self, name, callback, interval_ms, priority, widget, jitter):
+        self.name = name
+        self.callback = callback
+        self.interval_ms = interval_ms
+        self.priority = priority
+        self.widget = widget
+        self.jitter = jitter
+
+        # Jobs start paused, components resume them in start()
+        self.paused = True
+        self.obscured = False
+        self.next_due = 0.0
+
+        # Multiplies the interval while the callback is slow
+        self.backoff = 1.0
+        self.avg_runtime_ms = 0.0
+        # Slowest work the callback handed to other threads since its
+        # last run, and the latest such time (counted as its runtime)
+        self.reported_ms = None
+        self.offloaded_ms = 0.0
+        self.runs = 0
+        self.skips = 0
+
+        # Fully covered windows report this on X11
+        if widget is not None:
+            widget.bind("<Visibility>", self._on_visibility, add="+")
+
+
+    def _on_visibility(self, event):
+        self.obscured = str(event.state) == "VisibilityFullyObscured"
+
+
+    def pause(self):
+        '''Stop running the job (until resumed)'''
+        self.paused = True
+
+
+    def resume(self, immediately=True):
+        '''Run the job again, on the next scheduler tick by default'''
+        self.paused = False
+        if immediately:
+            self.next_due = 0.0
+
+
+    def report_runtime(self, runtime_ms):
+        '''Time taken by work the callback started on another thread (e.g.
+        a REST request on an executor), so it still backs the job off when
+        slow. Can be called from any thread.'''
+        if self.reported_ms is None or runtime_ms > self.reported_ms:
+            self.reported_ms = runtime_ms
+
+
+    def is_hidden(self):
+        '''True if the job's widget can't be seen right now'''
+        if self.widget is None:
+            return False
+        return self.obscured or not self.widget.winfo_viewable()
+
+
+class RefreshScheduler:
+    '''Central scheduler for every periodic job of the dashboard
+
+    One Tk after loop runs all due jobs, highest priority first, within a
+    time budget per tick. Each run is jittered so jobs don't fire in
+    lockstep. Jobs whose widget is hidden (minimized, unmapped or fully
+    obscured) are skipped. Intervals back off when the Tk event loop lags
+    and per job when the callback (usually a REST request) gets slow.
+    '''
+
+    def __init__(self, root, tick_ms=100, budget_ms=50, lag_threshold_ms=100,
+                 slow_call_ms=800, max_backoff=8.0):
+        self.root = root
+        self.tick_ms = tick_ms
+        self.budget_ms = budget_ms
+        self.lag_threshold_ms = lag_threshold_ms
+        self.slow_call_ms = slow_call_ms
+        self.max_backoff = max_backoff
+
+        self.jobs = []
+        self.after_id = None
+        self.expected_tick = None
+
+        # Shared by all jobs, grows while the event loop lags
+        self.avg_lag_ms = 0.0
+        self.loop_backoff = 1.0
+
+
+    def register(self, name, callback, interval_ms, priority=0, widget=None,
+                 jitter=0.1):
+        '''Register a periodic job and return it (paused)'''
+        job = RefreshJob(name, callback, interval_ms, priority, widget, jitter)
+        self.jobs.append(job)
+        # Keep highest priority first, so ticks don't need to sort
+        self.jobs.sort(key=lambda j: -j.priority)
+        return job
+
+
+    def unregister(self, job):
+        '''Remove a job for good'''
+        if job in self.jobs:
+            self.jobs.remove(job)
+
+
+    def start(self):
+        '''Start the scheduler loop'''
+        if self.after_id:
+            return
+        self.expected_tick = time.monotonic() + self.tick_ms / 1000
+        self.after_id = self.root.after(self.tick_ms, self._tick)
+
+
+    def stop(self):
+        '''Stop the scheduler loop'''
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+
+    def _tick(self):
+        now = time.monotonic()
+
+        # How late this tick fired is how busy the event loop is
+        lag_ms = max(0.0, (now - self.expected_tick) * 1000)
+        self.avg_lag_ms += 0.2 * (lag_ms - self.avg_lag_ms)
+        if self.avg_lag_ms > self.lag_threshold_ms:
+            self.loop_backoff = min(self.max_backoff, self.loop_backoff * 1.25)
+        else:
+            self.loop_backoff = max(1.0, self.loop_backoff * 0.95)
+
+        for job in self.jobs:
+            if job.paused or now < job.next_due:
+                continue
+
+            # Out of budget, lower priority jobs wait for the next tick
+            if (time.monotonic() - now) * 1000 > self.budget_ms:
+                break
+
+            if job.is_hidden():
+                job.skips += 1
+                job.next_due = now + job.interval_ms / 1000
+                continue
+
+            self._run(job)
+
+        # Only lateness beyond our own jobs counts as lag next time
+        self.expected_tick = time.monotonic() + self.tick_ms / 1000
+        self.after_id = self.root.after(self.tick_ms, self._tick)
+
+
+    def _run(self, job):
+        '''Run one job and reschedule it'''
+        start = time.monotonic()
+        failed = False
+        try:
+            job.callback()
+        except Exception as err:
+            print(f"[Scheduler] {job.name} failed: {err}")
+            failed = True
+        end = time.monotonic()
+
+        if job.reported_ms is not None:
+            job.offloaded_ms, job.reported_ms = job.reported_ms, None
+        runtime_ms = max((end - start) * 1000, job.offloaded_ms)
+        job.runs += 1
+        job.avg_runtime_ms += 0.3 * (runtime_ms - job.avg_runtime_ms)
+        if failed or job.avg_runtime_ms > self.slow_call_ms:
+            job.backoff = min(self.max_backoff, job.backoff * 1.5)
+        else:
+            job.backoff = max(1.0, job.backoff * 0.8)
+
+        interval = job.interval_ms * job.backoff * self.loop_backoff
+        interval *= random.uniform(1 - job.jitter, 1 + job.jitter)
+        job.next_due = end + interval / 1000
+
+
+    def stats(self):
+        '''Current state of the scheduler (for debugging and benchmarks)'''
+        return {
+            "avg_lag_ms": self.avg_lag_ms,
+            "loop_backoff": self.loop_backoff,
+            "jobs": {
+                job.name: {
+                    "paused": job.paused,
+                    "runs": job.runs,
+                    "skips": job.skips,
+                    "backoff": job.backoff,
+                    "avg_runtime_ms": job.avg_runtime_ms
+                }
+                for job in self.jobs
+            }
+        }
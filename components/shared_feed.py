@@ -0,0 +1,335 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import time
+import struct
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+#-----------------------------------------------------------------------------#
+
+# Default shared memory name, used by collector.py and main.py --attach
+SHM_NAME = "orbit_feed"
+
+MAGIC = b"ORBITFD1"
+FEED_VERSION = 3
+
+# Header: magic, version, capacity, slot size, write sequence, heartbeat
+# (writer's wall clock in ms), run id (writer's start time in ns, tells a
+# restarted collector's memory from the one it replaced), attach count
+# (bumped by every reader that attaches, the writer then republishes
+# the candle history)
+HEADER = struct.Struct("<8sIIIQqqI")
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 20
+HEARTBEAT_OFFSET = 28
+ATTACH_COUNT_OFFSET = 44
+
+# Readers call the feed stale when the heartbeat is older than this
+HEARTBEAT_TIMEOUT_MS = 5000
+# How often a reader of a stale feed looks for a restarted collector
+REATTACH_INTERVAL_MS = 1000
+
+# Slot: sequence, kind, venue tag, symbol, timestamp (ms), value count,
+# then up to MAX_VALUES doubles
+SLOT_SIZE = 512
+SLOT_HEADER = struct.Struct("<QB3s12sqH")
+VALUES_OFFSET = 40
+MAX_VALUES = (SLOT_SIZE - VALUES_OFFSET) // 8
+
+# Record kinds
+TICK = 1      # price, change, percent
+TRADE = 2     # price, quantity, is_buy
+BOOK = 3      # bid price/qty pairs then ask price/qty pairs (count = levels)
+CANDLE = 4    # open, high, low, close, volume (timestamp = open time)
+# Not a record, readers call STALE subscribers with True when the
+# heartbeat stops and False when it comes back
+STALE = 0
+
+BOOK_LEVELS = 10
+CANDLE_HISTORY = 1000
+
+
+class SharedFeedWriter:
+    '''Single writer side of the shared memory ring buffer
+
+    Every record goes into the next fixed size slot. A slot's sequence is
+    set odd while it is written and even once complete (a seqlock), and
+    the header's write sequence only moves after that, so readers never
+    need a lock. The lock here only serializes this process's threads.
+    '''
+
+    def __init__(self, name=SHM_NAME, capacity=32768):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_SIZE + capacity * SLOT_SIZE
+        )
+        self.buf = self.shm.buf
+        self.lock = threading.Lock()
+        self.write_seq = 0
+
+        HEADER.pack_into(self.buf, 0, MAGIC, FEED_VERSION, capacity,
+                         SLOT_SIZE, 0, int(time.time() * 1000), time.time_ns(), 0)
+
+
+    def heartbeat(self):
+        '''Tell the readers this writer is still running (call every second)'''
+        struct.pack_into("<q", self.buf, HEARTBEAT_OFFSET, int(time.time() * 1000))
+
+
+    def attach_count(self):
+        '''Readers attached so far, a change means one wants the candle
+        history republished'''
+        return struct.unpack_from("<I", self.buf, ATTACH_COUNT_OFFSET)[0]
+
+
+    def write(self, kind, symbol, timestamp, values, venue=b"", count=None):
+        '''Append one record'''
+        values = list(values)[:MAX_VALUES]
+
+        with self.lock:
+            index = self.write_seq
+            offset = HEADER_SIZE + (index % self.capacity) * SLOT_SIZE
+
+            # Sequence is odd while writing, readers skip the slot
+            SLOT_HEADER.pack_into(
+                self.buf, offset, 2 * index + 1, kind, venue,
+                symbol.encode(), int(timestamp),
+                len(values) if count is None else count
+            )
+            struct.pack_into(f"<{len(values)}d", self.buf,
+                             offset + VALUES_OFFSET, *values)
+            struct.pack_into("<Q", self.buf, offset, 2 * index + 2)
+
+            self.write_seq = index + 1
+            struct.pack_into("<Q", self.buf, WRITE_SEQ_OFFSET, self.write_seq)
+
+
+    def write_tick(self, symbol, timestamp, price, change, percent):
+        self.write(TICK, symbol, timestamp, (price, change, percent))
+
+
+    def write_trade(self, symbol, timestamp, price, quantity, is_buy):
+        self.write(TRADE, symbol, timestamp, (price, quantity, float(is_buy)))
+
+
+    def write_book(self, symbol, timestamp, venue_tag, bids, asks):
+        '''One venue's top BOOK_LEVELS bids and asks'''
+        bids = list(bids[:BOOK_LEVELS])
+        asks = list(asks[:BOOK_LEVELS])
+        # Bid side is padded so asks always start at the same place,
+        # the real level counts go in count (bids low byte, asks high byte)
+        padded = bids + [(0.0, 0.0)] * (BOOK_LEVELS - len(bids))
+        values = [v for level in padded for v in level[:2]]
+        values += [v for level in asks for v in level[:2]]
+        self.write(BOOK, symbol, timestamp, values, venue=venue_tag.encode(),
+                   count=len(bids) | len(asks) << 8)
+
+
+    def write_candle(self, symbol, open_time, o, h, l, c, v):
+        self.write(CANDLE, symbol, open_time, (o, h, l, c, v))
+
+
+    def close(self):
+        '''Detach and remove the shared memory'''
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedFeedReader:
+    '''Reader side of the shared memory ring buffer (any number of these)
+
+    poll() walks the records written since the last poll straight out of
+    the shared buffer, keeps the latest tick/book/candles per symbol and
+    calls the subscribers. A reader that falls more than a whole ring
+    behind skips ahead and counts the records it missed. While the feed
+    is stale the reader re-opens name, and moves over when a restarted
+    collector has put new memory there.
+    '''
+
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        self.shm = None
+        self.dropped = 0
+        self.map(attach(name))
+        # Last heartbeat check, STALE subscribers hear about changes
+        self.alive = True
+        self.next_reattach = 0
+
+        # Latest state
+        self.ticks = {}       # symbol -> (price, change, percent)
+        self.books = {}       # (symbol, venue tag) -> (bids, asks)
+        self.candle_map = {}  # symbol -> {open time: [t, o, h, l, c, v]}
+
+        # (kind, symbol) -> callbacks
+        self.subscribers = {}
+
+
+    def map(self, shm):
+        '''Start reading shm (closed instead if it isn't a feed)'''
+        magic, version, capacity, slot_size, write_seq, _, run_id, attached = \
+            HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != FEED_VERSION or slot_size != SLOT_SIZE:
+            shm.close()
+            raise ValueError(f"{self.name} is not an ORBIT feed (version {FEED_VERSION})")
+
+        if self.shm is not None:
+            self.buf = None
+            self.shm.close()
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = capacity
+        self.run_id = run_id
+        # Start with whatever is still in the ring, so books are there
+        # right away. Candles are likely lapped by the trades, ask the
+        # writer for them again (two readers attaching at once may only
+        # count once, the count still changes)
+        self.cursor = max(0, write_seq - capacity)
+        struct.pack_into("<I", self.buf, ATTACH_COUNT_OFFSET,
+                         (attached + 1) & 0xFFFFFFFF)
+
+
+    def reattach(self):
+        '''Move to the memory under name if a new collector created it,
+        returns whether it did'''
+        now = time.time() * 1000
+        if now < self.next_reattach:
+            return False
+        self.next_reattach = now + REATTACH_INTERVAL_MS
+
+        try:
+            shm = attach(self.name)
+        except (FileNotFoundError, ValueError):
+            # Not restarted yet
+            return False
+        if HEADER.unpack_from(shm.buf, 0)[6] == self.run_id:
+            shm.close()
+            return False
+
+        try:
+            self.map(shm)
+        except ValueError:
+            return False
+        print(f"[SharedFeed] Re-attached to '{self.name}'")
+        return True
+
+
+    def subscribe(self, kind, symbol, callback):
+        '''Call callback(*values) for each TICK/TRADE record of symbol
+        (symbol None and callback(is_stale) for STALE)'''
+        self.subscribers.setdefault((kind, symbol), []).append(callback)
+
+
+    def unsubscribe(self, kind, symbol, callback):
+        callbacks = self.subscribers.get((kind, symbol), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+    def is_alive(self):
+        '''True while the writer's heartbeat is recent'''
+        heartbeat = struct.unpack_from("<q", self.buf, HEARTBEAT_OFFSET)[0]
+        return time.time() * 1000 - heartbeat < HEARTBEAT_TIMEOUT_MS
+
+
+    def poll(self, max_records=20000):
+        '''Read new records, returns how many were read'''
+        alive = self.is_alive() or (self.reattach() and self.is_alive())
+        if alive != self.alive:
+            self.alive = alive
+            print("[SharedFeed] Collector is back" if alive
+                  else "[SharedFeed] Collector stopped updating")
+            for callback in self.subscribers.get((STALE, None), ()):
+                callback(not alive)
+
+        write_seq = struct.unpack_from("<Q", self.buf, WRITE_SEQ_OFFSET)[0]
+
+        # Lapped by the writer, skip to the oldest record still there
+        if write_seq - self.cursor > self.capacity:
+            self.dropped += write_seq - self.capacity - self.cursor
+            self.cursor = write_seq - self.capacity
+
+        end = min(write_seq, self.cursor + max_records)
+        updated_ticks = {}
+        read = 0
+
+        while self.cursor < end:
+            index = self.cursor
+            self.cursor += 1
+            offset = HEADER_SIZE + (index % self.capacity) * SLOT_SIZE
+
+            seq, kind, venue, symbol, timestamp, count = \
+                SLOT_HEADER.unpack_from(self.buf, offset)
+            if seq != 2 * index + 2:
+                # Already overwritten (or being overwritten)
+                self.dropped += 1
+                continue
+
+            if kind == BOOK:
+                bid_count, ask_count = count & 0xFF, count >> 8
+                n = 2 * BOOK_LEVELS + 2 * ask_count
+            else:
+                n = count
+            values = struct.unpack_from(f"<{n}d", self.buf, offset + VALUES_OFFSET)
+
+            # Seqlock check, the writer got to the slot while reading
+            if struct.unpack_from("<Q", self.buf, offset)[0] != seq:
+                self.dropped += 1
+                continue
+
+            symbol = symbol.rstrip(b"\0").decode()
+            read += 1
+
+            if kind == TICK:
+                # Only the newest tick per symbol is passed on
+                updated_ticks[symbol] = values
+            elif kind == TRADE:
+                for callback in self.subscribers.get((TRADE, symbol), ()):
+                    callback(timestamp, values[0], values[1], values[2] > 0.5)
+            elif kind == BOOK:
+                half = 2 * BOOK_LEVELS
+                bids = [values[i:i + 2] for i in range(0, 2 * bid_count, 2)]
+                asks = [values[i:i + 2] for i in range(half, n, 2)]
+                self.books[(symbol, venue.rstrip(b"\0").decode())] = (bids, asks)
+            elif kind == CANDLE:
+                candles = self.candle_map.setdefault(symbol, {})
+                candles[timestamp] = [timestamp, *values]
+                if len(candles) > CANDLE_HISTORY:
+                    del candles[min(candles)]
+
+        for symbol, values in updated_ticks.items():
+            self.ticks[symbol] = values
+            for callback in self.subscribers.get((TICK, symbol), ()):
+                callback(*values)
+
+        return read
+
+
+    def candles(self, symbol):
+        '''Known candles of symbol as [t, o, h, l, c, v], oldest first'''
+        candles = self.candle_map.get(symbol, {})
+        return [candles[t] for t in sorted(candles)]
+
+
+    def book(self, symbol, venue_tag):
+        '''Latest (bids, asks) of one venue, None if not seen yet'''
+        return self.books.get((symbol, venue_tag))
+
+
+    def close(self):
+        '''Detach (the collector owns and removes the memory)'''
+        self.buf = None
+        self.shm.close()
+
+
+def attach(name):
+    '''Attach to existing shared memory without taking ownership of it'''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the memory with the
+        # resource tracker, which would remove it when this process exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
@@ -0,0 +1,128 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+#-----------------------------------------------------------------------------#
+
+# Set path for state.json
+BASE_DIR = Path(__file__).resolve().parent
+STATE_FILE = BASE_DIR / "state.json"
+
+# Bump when the layout of state.json changes
+SNAPSHOT_VERSION = 1
+
+TICKER_NAMES = ("btc", "eth", "sol", "doge", "shib")
+
+
+def default_state():
+    '''State used for first time users (or when state.json is unusable)'''
+    return {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": None,
+        "layout": {
+            "visible": {name: name == "btc" for name in TICKER_NAMES},
+            "symbol": "BTCUSDT",
+            "display": "BTC/USDT"
+        },
+        # ticker symbol -> {"price", "change", "percent"}
+        "prices": {},
+        # {"symbol", "interval", "klines"} with klines as returned by Binance
+        "candles": None,
+        # {"symbol", "bids", "asks"} with levels as returned by Binance
+        "orderbook": None
+    }
+
+
+class StateSnapshot:
+    '''Versioned, atomically written snapshot of the dashboard state
+
+    Holds the layout (visible tickers and selected symbol), the last known
+    prices, and the most recent candles and order book, so the dashboard
+    can paint something right away on startup.
+    '''
+
+    def __init__(self, path=STATE_FILE):
+        self.path = Path(path)
+        self.data = default_state()
+
+
+    def load(self):
+        '''Load state.json, falling back to defaults'''
+        self.data = default_state()
+
+        try:
+            with open(self.path, "r") as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            return self.data
+        except (OSError, ValueError):
+            print("[State] state.json unreadable, using defaults")
+            return self.data
+
+        if not isinstance(loaded, dict) or loaded.get("version") != SNAPSHOT_VERSION:
+            print("[State] Unknown state.json version, using defaults")
+            return self.data
+
+        # Only take the parts that look right, so a hand edited or
+        # partially written file never crashes the app
+        layout = loaded.get("layout")
+        if isinstance(layout, dict):
+            visible = layout.get("visible")
+            if isinstance(visible, dict):
+                for name in TICKER_NAMES:
+                    if isinstance(visible.get(name), bool):
+                        self.data["layout"]["visible"][name] = visible[name]
+            if isinstance(layout.get("symbol"), str) and isinstance(layout.get("display"), str):
+                self.data["layout"]["symbol"] = layout["symbol"]
+                self.data["layout"]["display"] = layout["display"]
+
+        prices = loaded.get("prices")
+        if isinstance(prices, dict):
+            for symbol, last in prices.items():
+                if isinstance(last, dict) and all(
+                        isinstance(last.get(k), (int, float))
+                        for k in ("price", "change", "percent")):
+                    self.data["prices"][symbol] = last
+
+        candles = loaded.get("candles")
+        if isinstance(candles, dict) and isinstance(candles.get("klines"), list):
+            self.data["candles"] = candles
+
+        orderbook = loaded.get("orderbook")
+        if isinstance(orderbook, dict) and isinstance(orderbook.get("bids"), list) \
+                and isinstance(orderbook.get("asks"), list):
+            self.data["orderbook"] = orderbook
+
+        self.data["saved_at"] = loaded.get("saved_at")
+        return self.data
+
+
+    def save(self):
+        '''Write state.json atomically (temp file + rename)'''
+        self.data["version"] = SNAPSHOT_VERSION
+        self.data["saved_at"] = int(time.time() * 1000)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".state-",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+    def get_cached(self, key, symbol):
+        '''Return the cached candles/orderbook entry if it is for symbol'''
+        entry = self.data.get(key)
+        if entry and entry.get("symbol") == symbol:
+            return entry
+        return None
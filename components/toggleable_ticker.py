@@ -6,24 +6,36 @@ from tkinter import ttk
 import websocket
 import json
 import threading
-from pathlib import Path
 
-#-----------------------------------------------------------------------------#
+from components.shared_feed import TICK, STALE
 
-# Set path for price_memory.txt
-BASE_DIR = Path(__file__).resolve().parent
-PRICE_MEMORY_FILE = BASE_DIR / "price_memory.txt"
+#-----------------------------------------------------------------------------#
 
 
 class CryptoTicker:
     '''Reusable ticker component for any cryptocurrency'''
 
-    def __init__(self, parent, symbol, display_name):
+    def __init__(self, parent, symbol, display_name, feed=None):
         self.parent = parent
         self.symbol = symbol.lower()
         self.display_name = display_name
         self.is_active = False
+        # Shared memory feed from collector.py, replaces the websocket
+        self.feed = feed
         self.ws = None
+        self.thread = None
+        # Last (price, change, percent), kept for the state snapshot
+        self.last_values = None
+
+        # Newest values not painted yet; only one GUI update is queued
+        # at a time, however fast messages arrive
+        self.pending_values = None
+        self.update_queued = False
+
+        # Called with (SYMBOL, price, change, percent) on every live update
+        self.listeners = []
+        # Called with (SYMBOL) when the ticker stops
+        self.stop_listeners = []
 
         # Create UI
         self.frame = tk.Frame(parent, relief="sunken", borderwidth=1,
@@ -55,6 +67,13 @@ class CryptoTicker:
             return
 
         self.is_active = True
+
+        # Attached to a collector, ticks come in through the feed poll
+        if self.feed is not None:
+            self.feed.subscribe(TICK, self.symbol.upper(), self.update_display)
+            self.feed.subscribe(STALE, None, self.on_feed_stale)
+            return
+
         ws_url = f"wss://stream.binance.com:9443/ws/{self.symbol}@ticker"
 
         self.ws = websocket.WebSocketApp(
@@ -65,29 +84,62 @@ class CryptoTicker:
             on_open=lambda ws: print(f"{(self.symbol).upper()} Connected")
         )
 
-        threading.Thread(target=self.ws.run_forever, daemon=True).start()
+        self.thread = threading.Thread(target=self.ws.run_forever, daemon=True,
+                                       name=f"ticker-{self.symbol}")
+        self.thread.start()
 
 
     def stop(self):
         '''Stop websocket connection'''
         self.is_active = False
+        if self.feed is not None:
+            self.feed.unsubscribe(TICK, self.symbol.upper(), self.update_display)
+            self.feed.unsubscribe(STALE, None, self.on_feed_stale)
         if self.ws:
             self.ws.close()
             self.ws = None
+        if self.thread:
+            # Every start makes a new socket thread, wait for the old one
+            # so toggling can't pile them up (short timeout, a message
+            # half way through on_message may be waiting on Tk)
+            self.thread.join(timeout=1)
+            if self.thread.is_alive():
+                print(f"{(self.symbol).upper()} Socket thread still running after close")
+            self.thread = None
+
+        for listener in self.stop_listeners:
+            listener(self.symbol.upper())
 
 
     def on_message(self, ws, message):
         '''Handle price updates'''
-        if not self.is_active:
+        # Ignore late messages from a socket closed by an earlier toggle
+        if not self.is_active or ws is not self.ws:
             return
 
         data = json.loads(message)
-        price = float(data['c'])
-        change = float(data['p'])
-        percent = float(data['P'])
+        self.pending_values = (float(data['c']), float(data['p']),
+                               float(data['P']))
+
+        # Schedule GUI update on main thread (unless one is already queued)
+        if not self.update_queued:
+            self.update_queued = True
+            self.parent.after(0, self.flush_display)
+
+
+    def on_feed_stale(self, is_stale):
+        '''Grey out the last price while the collector is gone, the next
+        tick paints it live again'''
+        if is_stale and self.last_values:
+            self.show_stale(*self.last_values)
+
 
-        # Schedule GUI update on main thread
-        self.parent.after(0, self.update_display, price, change, percent)
+    def flush_display(self):
+        '''Paint the newest pending values'''
+        # Cleared first, so a message arriving now queues a new update
+        self.update_queued = False
+        if self.pending_values:
+            self.update_display(*self.pending_values)
 
 
     def update_display(self, price, change, percent):
@@ -95,7 +147,30 @@ class CryptoTicker:
         if not self.is_active:
             return
 
-        color = "#00bf63" if change >= 0 else "red"
+        self.last_values = (price, change, percent)
+        self.paint(price, change, percent,
+                   "#00bf63" if change >= 0 else "red")
+
+        for listener in self.listeners:
+            listener(self.symbol.upper(), price, change, percent)
+
+
+    def add_listener(self, callback, on_stop=None):
+        '''Also pass live prices on to callback (e.g. the local gateway),
+        and tell on_stop when they stop coming'''
+        self.listeners.append(callback)
+        if on_stop is not None:
+            self.stop_listeners.append(on_stop)
+
+
+    def show_stale(self, price, change, percent):
+        '''Show the last known values (greyed out) until live data arrives'''
+        self.last_values = (price, change, percent)
+        self.paint(price, change, percent, "#a0a6ad")
+
+
+    def paint(self, price, change, percent, color):
+        '''Write the values into the labels'''
         self.price_label.config(text=f"{price:,.2f}", fg=color)
 
         sign = "+" if change >= 0 else ""
@@ -116,9 +191,10 @@ class CryptoTicker:
 
 
 class ToggleableTickerApp:
-    def __init__(self, frame_parent, root):
+    def __init__(self, frame_parent, root, snapshot, feed=None):
         self.root = root
         self.frame_parent = frame_parent
+        self.snapshot = snapshot
         # self.root.title("Crypto Dashboard with Toggle")
         # self.root.geometry("1000x400")
         self.sol_visible = False
@@ -128,11 +204,20 @@ class ToggleableTickerApp:
         self.ticker_frame.pack(fill=tk.BOTH, expand=True)
 
         # Create tickers
-        self.btc_ticker = CryptoTicker(self.ticker_frame, "btcusdt", "BTC/USDT")
-        self.eth_ticker = CryptoTicker(self.ticker_frame, "ethusdt", "ETH/USDT")
-        self.sol_ticker = CryptoTicker(self.ticker_frame, "solusdt", "SOL/USDT")
-        self.doge_ticker = CryptoTicker(self.ticker_frame, "dogeusdt", "DOGE/USDT")
-        self.shib_ticker = CryptoTicker(self.ticker_frame, "shibusdt", "SHIB/USDT")
+        self.btc_ticker = CryptoTicker(self.ticker_frame, "btcusdt", "BTC/USDT", feed)
+        self.eth_ticker = CryptoTicker(self.ticker_frame, "ethusdt", "ETH/USDT", feed)
+        self.sol_ticker = CryptoTicker(self.ticker_frame, "solusdt", "SOL/USDT", feed)
+        self.doge_ticker = CryptoTicker(self.ticker_frame, "dogeusdt", "DOGE/USDT", feed)
+        self.shib_ticker = CryptoTicker(self.ticker_frame, "shibusdt", "SHIB/USDT", feed)
+
+        # Same tickers by name (matches the keys in the state snapshot)
+        self.tickers = {
+            "btc": self.btc_ticker,
+            "eth": self.eth_ticker,
+            "sol": self.sol_ticker,
+            "doge": self.doge_ticker,
+            "shib": self.shib_ticker
+        }
 
         # Set visible state boolean
         self.btc_visible = False
@@ -142,58 +227,21 @@ class ToggleableTickerApp:
         self.shib_visible = False
 
     def set_preference(self):
-        '''Get data from price_memory.txt and open the tickers
-        that were open since last closed'''
-        with open(PRICE_MEMORY_FILE, "r") as f:
-            preference = f.readlines()
-
-            # For cases when user accidentally deletes the content of
-            # price_memory.txt
-            if len(preference) == 0:
-                self.btc_visible = True
-                self.btc_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                self.btc_ticker.start()
-
-            else:
-                # Read the values from .txt file
-                values = [line.strip().split(" = ")[1] for line in preference]
-
-                # Set the attribute value to the ones stored in the .txt
-                self.btc_visible = values[0] == "True"
-                self.eth_visible = values[1] == "True"
-                self.sol_visible = values[2] == "True"
-                self.doge_visible = values[3] == "True"
-                self.shib_visible = values[4] == "True"
-
-                # Start up the price tickers
-                if self.btc_visible:
-                    self.btc_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                    self.btc_ticker.start()
-                if self.eth_visible:
-                    self.eth_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                    self.eth_ticker.start()
-                if self.sol_visible:
-                    self.sol_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                    self.sol_ticker.start()
-                if self.doge_visible:
-                    self.doge_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                    self.doge_ticker.start()
-                if self.shib_visible:
-                    self.shib_ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-                    self.shib_ticker.start()
-
-
-    def ensure_file_valid(self):
-        '''Ensure price_memory.txt exists'''
-        # Create the file for first time users
-        if not PRICE_MEMORY_FILE.exists():
-            PRICE_MEMORY_FILE.write_text(
-                "btc_visible = True\n"
-                "eth_visible = False\n"
-                "sol_visible = False\n"
-                "doge_visible = False\n"
-                "shib_visible = False\n"
-            )
+        '''Open the tickers that were open since last closed, showing
+        their last known prices until the websockets catch up'''
+        visible = self.snapshot.data["layout"]["visible"]
+        prices = self.snapshot.data["prices"]
+
+        for name, ticker in self.tickers.items():
+            # Paint every ticker, so the ones toggled on later aren't empty
+            last = prices.get(ticker.symbol)
+            if last:
+                ticker.show_stale(last["price"], last["change"], last["percent"])
+
+            setattr(self, f"{name}_visible", visible[name])
+            if visible[name]:
+                ticker.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
+                ticker.start()
 
 
     def toggle_btc(self):
@@ -266,18 +314,26 @@ class ToggleableTickerApp:
             self.shib_visible = True
 
 
+    def store_state(self):
+        '''Put the layout and last prices into the snapshot (not saved yet)'''
+        for name, ticker in self.tickers.items():
+            self.snapshot.data["layout"]["visible"][name] = getattr(self, f"{name}_visible")
+            if ticker.last_values:
+                price, change, percent = ticker.last_values
+                self.snapshot.data["prices"][ticker.symbol] = {
+                    "price": price, "change": change, "percent": percent
+                }
+
+
     def on_closing(self):
         """Clean up when closing."""
-        with open(PRICE_MEMORY_FILE, "w") as f:
-            f.write(f"btc_visible = {self.btc_visible}\n"
-                    f"eth_visible = {self.eth_visible}\n"
-                    f"sol_visible = {self.sol_visible}\n"
-                    f"doge_visible = {self.doge_visible}\n"
-                    f"shib_visible = {self.shib_visible}")
+        # Store layout and last prices, then write the whole snapshot
+        self.store_state()
+        self.snapshot.save()
+
         self.btc_ticker.stop()
         self.eth_ticker.stop()
         self.sol_ticker.stop()
         self.doge_ticker.stop()
         self.shib_ticker.stop()
         self.root.destroy()
-
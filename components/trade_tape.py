@@ -0,0 +1,415 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import tkinter as tk
+import websocket
+import json
+import math
+import threading
+import datetime
+from collections import deque
+
+from components.shared_feed import TRADE
+
+#-----------------------------------------------------------------------------#
+
+
+class TradeAggregator:
+    '''Incremental aggregates over the most recent trades
+
+    Trades are kept in a fixed size ring buffer. The per-second buy/sell
+    volume and the price-bucketed volume profile are updated as each trade
+    arrives (and as old trades fall out of the ring buffer), so nothing is
+    ever recomputed from scratch.
+    '''
+
+    def __init__(self, capacity=2000, seconds=60):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.seconds = seconds
+        # Bumped by every reset, trades tagged with an older one are from
+        # the previous currency
+        self.generation = 0
+        self.reset()
+
+
+    def reset(self):
+        '''Drop every trade and aggregate (used when switching currency)'''
+        with self.lock:
+            # (time_ms, price, quantity, is_buy, bucket)
+            self.trades = deque(maxlen=self.capacity)
+            # [second, buy_volume, sell_volume]
+            self.per_second = deque(maxlen=self.seconds)
+            # bucket -> [buy_volume, sell_volume, trade_count]
+            self.profile = {}
+            self.bucket_size = None
+            # Bumped on every trade so the panel knows when to repaint
+            self.version = 0
+            self.generation += 1
+
+
+    def choose_bucket_size(self, price):
+        '''Pick a profile bucket about 1/1000th of the price
+        (e.g. 10 USDT for BTC, 0.0001 USDT for DOGE)'''
+        if price <= 0:
+            return 1.0
+        return 10.0 ** (math.floor(math.log10(price)) - 3)
+
+
+    def price_decimals(self):
+        '''Decimals that tell profile buckets apart (at least 2)'''
+        if not self.bucket_size:
+            return 2
+        return max(2, -math.floor(math.log10(self.bucket_size)))
+
+
+    def add_trade(self, time_ms, price, quantity, is_buy, generation=None):
+        '''Add one executed trade to the ring buffer and aggregates
+        (dropped if tagged with a generation from before the last reset)'''
+        with self.lock:
+            # Checked under the lock, a late trade would otherwise pick
+            # the new currency's bucket size
+            if generation is not None and generation != self.generation:
+                return
+
+            if self.bucket_size is None:
+                self.bucket_size = self.choose_bucket_size(price)
+
+            # The oldest trade is about to be pushed out, remove it
+            # from the profile first
+            if len(self.trades) == self.capacity:
+                self._remove_from_profile(self.trades[0])
+
+            bucket = int(price // self.bucket_size)
+            trade = (time_ms, price, quantity, is_buy, bucket)
+            self.trades.append(trade)
+            self._add_to_profile(trade)
+            self._add_to_seconds(time_ms // 1000, quantity, is_buy)
+            self.version += 1
+
+
+    def _add_to_profile(self, trade):
+        level = self.profile.get(trade[4])
+        if level is None:
+            level = self.profile[trade[4]] = [0.0, 0.0, 0]
+
+        level[0 if trade[3] else 1] += trade[2]
+        level[2] += 1
+
+
+    def _remove_from_profile(self, trade):
+        level = self.profile[trade[4]]
+        level[2] -= 1
+
+        # Delete empty buckets (also gets rid of float leftovers)
+        if level[2] == 0:
+            del self.profile[trade[4]]
+        else:
+            level[0 if trade[3] else 1] -= trade[2]
+
+
+    def _add_to_seconds(self, second, quantity, is_buy):
+        side = 1 if is_buy else 2
+
+        if self.per_second and second <= self.per_second[-1][0]:
+            # Same second (or a late trade), search backwards for its slot
+            for entry in reversed(self.per_second):
+                if entry[0] == second:
+                    entry[side] += quantity
+                    return
+                if entry[0] < second:
+                    return
+            return
+
+        # New second, fill any quiet seconds in between with zeros
+        if self.per_second:
+            gap = min(second - self.per_second[-1][0] - 1, self.seconds)
+            for s in range(second - gap, second):
+                self.per_second.append([s, 0.0, 0.0])
+
+        entry = [second, 0.0, 0.0]
+        entry[side] += quantity
+        self.per_second.append(entry)
+
+
+    def snapshot(self, trade_count=10, level_count=12):
+        '''Copy out what the panel needs to draw, under the lock
+
+        Returns the latest trades (newest first), the last completed second
+        as (buy_volume, sell_volume), and up to level_count profile levels
+        around the last traded price as (price, buy_volume, sell_volume),
+        highest price first.
+        '''
+        with self.lock:
+            trades = [t[:4] for t in list(self.trades)[-trade_count:]]
+            trades.reverse()
+
+            if len(self.per_second) >= 2:
+                last_second = tuple(self.per_second[-2][1:])
+            elif self.per_second:
+                last_second = tuple(self.per_second[-1][1:])
+            else:
+                last_second = (0.0, 0.0)
+
+            levels = []
+            if self.trades:
+                buckets = sorted(self.profile, reverse=True)
+                last_bucket = self.trades[-1][4]
+
+                # Window of buckets centered on the last traded price
+                center = buckets.index(last_bucket)
+                start = max(0, min(center - level_count // 2,
+                                   len(buckets) - level_count))
+                for bucket in buckets[start:start + level_count]:
+                    buy, sell, _ = self.profile[bucket]
+                    levels.append((bucket * self.bucket_size, buy, sell))
+
+            return trades, last_second, levels
+
+
+class TradeTapePanel:
+    '''Time & sales and volume profile panel, fed by the aggTrade stream'''
+
+    def __init__(self, parent, scheduler, currency="BTCUSDT", rows=8,
+                 levels=12, refresh_ms=500, feed=None):
+        self.parent = parent
+        self.currency = currency
+        # Shared memory feed from collector.py, replaces the websocket
+        self.feed = feed
+        self.rows = rows
+        self.levels = levels
+
+        self.aggregator = TradeAggregator()
+        self.ws = None
+        self.thread = None
+        self.is_active = False
+        self.painted_version = -1
+
+        self._build_ui()
+
+        # Repaint timer (paused while the panel can't be seen)
+        self.job = scheduler.register(
+            "trade_tape", self.refresh, refresh_ms, priority=3,
+            widget=self.container
+        )
+        self.start()
+
+
+    def _build_ui(self):
+        '''Build the time & sales GUI'''
+        self.container = tk.Frame(self.parent, bg="#1e1e1e")
+        self.container.pack(fill="x", pady=(8, 0))
+
+        # HEADER
+        header = tk.Frame(self.container, bg="#606060", relief="raised", bd=2)
+        header.pack(fill="x")
+
+        tk.Label(
+            header,
+            text="Time & Sales",
+            bg="#606060",
+            fg="white",
+            font=("Helvetica", 11, "bold")
+        ).pack(side="left", padx=8, pady=6)
+
+        # Last second buy/sell volume
+        self.volume_label = tk.Label(
+            self.container,
+            text="1s  Buy --  Sell --",
+            bg="#1e1e1e",
+            fg="#a0a6ad",
+            font=("Consolas", 9),
+            anchor="w"
+        )
+        self.volume_label.pack(fill="x", padx=6, pady=(4, 0))
+
+        # TRADE ROWS
+        self.data_frame = tk.Frame(self.container, bg="#1e1e1e")
+        self.data_frame.pack(fill="x", pady=4)
+
+        self.data_frame.columnconfigure(0, weight=1)  # Time
+        self.data_frame.columnconfigure(1, weight=1)  # Price
+        self.data_frame.columnconfigure(2, weight=1)  # Quantity
+
+        self.time_labels = []
+        self.price_labels = []
+        self.qty_labels = []
+
+        for r in range(self.rows):
+            t = tk.Label(self.data_frame, bg="#1e1e1e", fg="#a0a6ad",
+                         font=("Consolas", 9), anchor="w")
+            p = tk.Label(self.data_frame, bg="#1e1e1e", fg="#cfd8dc",
+                         font=("Consolas", 9), anchor="e")
+            q = tk.Label(self.data_frame, bg="#1e1e1e", fg="#cfd8dc",
+                         font=("Consolas", 9), anchor="e")
+
+            t.grid(row=r, column=0, sticky="w", padx=6)
+            p.grid(row=r, column=1, sticky="e", padx=6)
+            q.grid(row=r, column=2, sticky="e", padx=6)
+
+            self.time_labels.append(t)
+            self.price_labels.append(p)
+            self.qty_labels.append(q)
+
+        # VOLUME PROFILE
+        # Canvas items are created once and only moved/relabeled afterwards
+        self.profile_width = 240
+        self.row_height = 10
+        self.profile_canvas = tk.Canvas(
+            self.container,
+            width=self.profile_width,
+            height=self.levels * self.row_height,
+            bg="#1e1e1e",
+            highlightthickness=0
+        )
+        self.profile_canvas.pack(fill="x", padx=6, pady=(0, 6))
+
+        self.profile_items = []
+        for _ in range(self.levels):
+            price_text = self.profile_canvas.create_text(
+                0, 0, anchor="w", fill="#a0a6ad", font=("Consolas", 7))
+            buy_bar = self.profile_canvas.create_rectangle(
+                0, 0, 0, 0, fill="#00bf63", width=0)
+            sell_bar = self.profile_canvas.create_rectangle(
+                0, 0, 0, 0, fill="#ff4d4d", width=0)
+            self.profile_items.append((price_text, buy_bar, sell_bar))
+
+
+    def start(self):
+        '''Start aggTrade websocket and the repaint timer'''
+        if self.is_active:
+            return
+
+        self.is_active = True
+        self.job.resume()
+
+        # Attached to a collector, trades come in through the feed poll
+        if self.feed is not None:
+            self.feed.subscribe(TRADE, self.currency, self.aggregator.add_trade)
+            return
+
+        ws_url = f"wss://stream.binance.com:9443/ws/{self.currency.lower()}@aggTrade"
+        # This socket's trades only count until the next reset
+        generation = self.aggregator.generation
+
+        self.ws = websocket.WebSocketApp(
+            ws_url,
+            on_message=lambda ws, message: self.on_message(ws, message, generation),
+            on_error=lambda ws, err: print(f"[TradeTape] Error: {err}"),
+            on_close=lambda ws, s, m: print("[TradeTape] Disconnected"),
+            on_open=lambda ws: print(f"[TradeTape] Connected ({self.currency})")
+        )
+
+        self.thread = threading.Thread(target=self.ws.run_forever, daemon=True,
+                                       name="trade-tape")
+        self.thread.start()
+
+
+    def stop(self):
+        '''Stop websocket and repaint timer'''
+        self.is_active = False
+        if self.feed is not None:
+            self.feed.unsubscribe(TRADE, self.currency, self.aggregator.add_trade)
+
+        if self.ws:
+            self.ws.close()
+            self.ws = None
+        if self.thread:
+            # Switching currency starts a new socket thread, the old one
+            # has to be gone before that
+            self.thread.join(timeout=1)
+            if self.thread.is_alive():
+                print("[TradeTape] Socket thread still running after close")
+            self.thread = None
+
+        self.job.pause()
+
+
+    def on_message(self, ws, message, generation=None):
+        '''Handle trades (runs on the websocket thread, no GUI calls here)'''
+        # Ignore late trades from the previous currency's socket (the
+        # aggregator checks generation again, switch_currency can run
+        # between here and add_trade)
+        if not self.is_active or ws is not self.ws:
+            return
+
+        data = json.loads(message)
+        # "m" is True when the buyer is the maker, i.e. the aggressor sold
+        self.aggregator.add_trade(
+            int(data["T"]), float(data["p"]), float(data["q"]), not data["m"],
+            generation
+        )
+
+
+    def refresh(self):
+        '''Repaint from the aggregates at a fixed rate, not per trade'''
+        if not self.is_active:
+            return
+
+        if self.aggregator.version != self.painted_version:
+            self.painted_version = self.aggregator.version
+            self.update_display()
+
+
+    def update_display(self):
+        '''Update the trade rows, last second volume and volume profile'''
+        trades, (buy_volume, sell_volume), levels = \
+            self.aggregator.snapshot(self.rows, self.levels)
+        # Sub-cent buckets for e.g. DOGE and SHIB need more decimals
+        decimals = self.aggregator.price_decimals()
+
+        self.volume_label.config(
+            text=f"1s  Buy {buy_volume:,.4f}  Sell {sell_volume:,.4f}"
+        )
+
+        for i in range(self.rows):
+            if i < len(trades):
+                time_ms, price, qty, is_buy = trades[i]
+                color = "#00bf63" if is_buy else "#ff4d4d"
+                self.time_labels[i].config(
+                    text=datetime.datetime.fromtimestamp(time_ms / 1000)
+                    .strftime("%H:%M:%S")
+                )
+                self.price_labels[i].config(text=f"{price:,.{decimals}f}",
+                                            fg=color)
+                self.qty_labels[i].config(text=f"{qty:.6f}")
+            else:
+                self.time_labels[i].config(text="")
+                self.price_labels[i].config(text="")
+                self.qty_labels[i].config(text="")
+
+        # Bars are scaled to the largest level currently shown
+        text_width = 80
+        bar_space = self.profile_width - text_width
+        largest = max((buy + sell for _, buy, sell in levels), default=0.0)
+
+        for i, (price_text, buy_bar, sell_bar) in enumerate(self.profile_items):
+            y0 = i * self.row_height
+            y1 = y0 + self.row_height - 2
+
+            if i < len(levels) and largest > 0:
+                price, buy, sell = levels[i]
+                buy_width = bar_space * buy / largest
+                sell_width = bar_space * sell / largest
+
+                self.profile_canvas.itemconfig(price_text,
+                                                 text=f"{price:,.{decimals}f}")
+                self.profile_canvas.coords(price_text, 0, y0 + self.row_height / 2)
+                self.profile_canvas.coords(
+                    buy_bar, text_width, y0, text_width + buy_width, y1)
+                self.profile_canvas.coords(
+                    sell_bar, text_width + buy_width, y0,
+                    text_width + buy_width + sell_width, y1)
+            else:
+                self.profile_canvas.itemconfig(price_text, text="")
+                self.profile_canvas.coords(buy_bar, 0, 0, 0, 0)
+                self.profile_canvas.coords(sell_bar, 0, 0, 0, 0)
+
+
+    def switch_currency(self, new_currency):
+        '''Switch trade stream to another currency (used for button command)'''
+        self.stop()
+        self.currency = new_currency
+        self.aggregator.reset()
+        self.painted_version = -1
+        self.start()
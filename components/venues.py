@@ -0,0 +1,148 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import requests
+
+#-----------------------------------------------------------------------------#
+
+
+class VenueAdapter:
+    '''Base class for an exchange the orderbook pulls depth from
+
+    Subclasses implement fetch_depth, returning (bids, asks) as lists of
+    (price, quantity) floats, best level first. base_url can point at a
+    local stand-in server instead of the real exchange.
+    '''
+
+    name = "venue"
+    # Short tag shown next to every level
+    tag = "?"
+    base_url = ""
+    # False for venues served from this process (no network round trip)
+    remote = True
+
+    def __init__(self, base_url=None):
+        if base_url:
+            self.base_url = base_url
+
+
+    def fetch_depth(self, symbol, limit):
+        raise NotImplementedError
+
+
+    def parse_levels(self, levels):
+        '''["price", "qty", ...] string levels -> (price, qty) floats'''
+        return [(float(level[0]), float(level[1])) for level in levels]
+
+
+class BinanceVenue(VenueAdapter):
+    '''Binance spot /api/v3/depth'''
+
+    name = "Binance"
+    tag = "BIN"
+    base_url = "https://api.binance.com"
+
+    def fetch_depth(self, symbol, limit):
+        url = f"{self.base_url}/api/v3/depth"
+        params = {"symbol": symbol, "limit": limit}
+        data = requests.get(url, params=params, timeout=5).json()
+        return self.parse_levels(data["bids"]), self.parse_levels(data["asks"])
+
+
+    def fetch_klines(self, symbol, interval="1h", limit=24, end_time=None,
+                     start_time=None):
+        '''Raw /api/v3/klines candles, oldest first (up to end_time in ms
+        when given, for paging back through history, from start_time in
+        ms when given, for catching up)'''
+        url = f"{self.base_url}/api/v3/klines"
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        if end_time is not None:
+            params["endTime"] = int(end_time)
+        return requests.get(url, params=params, timeout=5).json()
+
+
+class BybitVenue(VenueAdapter):
+    '''Bybit spot /v5/market/orderbook'''
+
+    name = "Bybit"
+    tag = "BYB"
+    base_url = "https://api.bybit.com"
+
+    def fetch_depth(self, symbol, limit):
+        url = f"{self.base_url}/v5/market/orderbook"
+        params = {"category": "spot", "symbol": symbol, "limit": limit}
+        data = requests.get(url, params=params, timeout=5).json()["result"]
+        return self.parse_levels(data["b"]), self.parse_levels(data["a"])
+
+
+class OkxVenue(VenueAdapter):
+    '''OKX spot /api/v5/market/books (symbols like BTC-USDT)'''
+
+    name = "OKX"
+    tag = "OKX"
+    base_url = "https://www.okx.com"
+
+    def fetch_depth(self, symbol, limit):
+        url = f"{self.base_url}/api/v5/market/books"
+        params = {"instId": self.to_inst_id(symbol), "sz": limit}
+        data = requests.get(url, params=params, timeout=5).json()["data"][0]
+        return self.parse_levels(data["bids"]), self.parse_levels(data["asks"])
+
+
+    def to_inst_id(self, symbol):
+        '''BTCUSDT -> BTC-USDT'''
+        for quote in ("USDT", "USDC", "BTC"):
+            if symbol.endswith(quote):
+                return f"{symbol[:-len(quote)]}-{quote}"
+        return symbol
+
+
+class StaticVenue(VenueAdapter):
+    '''Offline stand-in venue serving books set with set_book
+
+    Used for benchmarks and for trying the consolidated book without
+    network access.
+    '''
+
+    remote = False
+
+    def __init__(self, name, tag, books=None):
+        super().__init__()
+        self.name = name
+        self.tag = tag
+        # symbol -> (bids, asks)
+        self.books = dict(books or {})
+
+
+    def set_book(self, symbol, bids, asks):
+        '''Replace the book served for symbol'''
+        self.books[symbol] = (bids, asks)
+
+
+    def fetch_depth(self, symbol, limit):
+        bids, asks = self.books[symbol]
+        return self.parse_levels(bids[:limit]), self.parse_levels(asks[:limit])
+
+
+class SharedFeedVenue(VenueAdapter):
+    '''One venue's book as published by collector.py over shared memory'''
+
+    remote = False
+
+    def __init__(self, reader, name, tag):
+        super().__init__()
+        self.reader = reader
+        self.name = name
+        self.tag = tag
+
+
+    def fetch_depth(self, symbol, limit):
+        if not self.reader.alive:
+            raise ConnectionError("the collector stopped updating the shared feed")
+        book = self.reader.book(symbol, self.tag)
+        if book is None:
+            raise LookupError(f"no {self.tag} book for {symbol} in the shared feed")
+        bids, asks = book
+        return bids[:limit], asks[:limit]
@@ -2,6 +2,7 @@
 # Modules
 
 import tkinter as tk
+import argparse
 import requests
 import numpy as np
 import matplotlib
@@ -11,15 +12,74 @@ import matplotlib
 from components.toggleable_ticker import ToggleableTickerApp
 from components.candlestick_chart import Candlestickchart
 from components.orderbook import OrderBookPanel
+from components.trade_tape import TradeTapePanel
+from components.state_snapshot import StateSnapshot
+from components.refresh_scheduler import RefreshScheduler
+from components.venues import BinanceVenue, BybitVenue, OkxVenue, SharedFeedVenue
+from components.shared_feed import SharedFeedReader, SHM_NAME
+from components.local_gateway import LocalGateway, GATEWAY_PORT
+
+#-----------------------------------------------------------------------------#
+# Command line options
+
+parser = argparse.ArgumentParser(description="ORBIT Cryptotracker")
+parser.add_argument("--attach", nargs="?", const=SHM_NAME, default=None,
+                    metavar="NAME",
+                    help="read the feeds from a running collector.py instead "
+                         "of opening exchange connections")
+parser.add_argument("--gateway", nargs="?", type=int, const=GATEWAY_PORT,
+                    default=None, metavar="PORT",
+                    help="re-broadcast prices and books to other local tools "
+                         f"over HTTP/websocket (port {GATEWAY_PORT} by default)")
+parser.add_argument("--history-days", type=int, default=30, metavar="DAYS",
+                    help="days of 1 minute candles the chart loads for "
+                         "panning and zooming (up to 365)")
+args = parser.parse_args()
+
+# Shared memory feed (None = this window opens its own connections)
+feed = None
+if args.attach:
+    try:
+        feed = SharedFeedReader(args.attach)
+        print(f"[SharedFeed] Attached to '{args.attach}'")
+    except (FileNotFoundError, ValueError) as err:
+        print(f"[SharedFeed] Can't attach ({err}), using direct feeds")
+
+# Local gateway for other tools (None = not serving)
+gateway = None
+if args.gateway:
+    gateway = LocalGateway(port=args.gateway)
+    try:
+        gateway.start()
+    except OSError as err:
+        print(f"[Gateway] Can't serve on port {args.gateway} ({err})")
+        gateway = None
+
+#-----------------------------------------------------------------------------#
+# Load saved state (layout, last prices, candles and book)
+
+snapshot = StateSnapshot()
+snapshot.load()
+selected = snapshot.data["layout"]
 
 #-----------------------------------------------------------------------------#
 # Creating Main Window
 
 root = tk.Tk()
 root.title("Project ORBIT")
-root.geometry("960x540")
+root.geometry("960x720")
 root.config(bg="#393939")
 
+# Every periodic refresh (chart, orderbook, ...) runs through this
+scheduler = RefreshScheduler(root)
+scheduler.start()
+
+# Drain the shared feed often, the components read from it
+if feed is not None:
+    feed_job = scheduler.register("shared_feed", feed.poll, 100, priority=4,
+                                  jitter=0)
+    feed_job.resume()
+
 #-----------------------------------------------------------------------------#
 # Top welcome message
 
@@ -146,10 +206,9 @@ dashboardlabel1 = tk.Label(
 dashboardlabel1.pack(pady=(10, 10), padx=(20,0), anchor="w")
 
 # Create price ticker
-dashboard_app = ToggleableTickerApp(pricedashboard, root)
+dashboard_app = ToggleableTickerApp(pricedashboard, root, snapshot, feed)
 
 # Load up preferences
-dashboard_app.ensure_file_valid()
 dashboard_app.set_preference()
 
 # Set price toggle button's command
@@ -182,7 +241,9 @@ chart_frame = tk.Frame(detaileddashboard, bg="#313131")
 chart_frame.pack(side="left", fill="both", expand=True)
 
 # Create the Candlestick chart and start it
-candlestick = Candlestickchart("BTCUSDT", dashboardlabel2, "BTC/USDT")
+candlestick = Candlestickchart(selected["symbol"], dashboardlabel2,
+                               selected["display"], scheduler, snapshot, feed,
+                               args.history_days)
 candlestick.initialize_graph(chart_frame)
 candlestick.start()
 
@@ -193,16 +254,40 @@ candlestick.start()
 orderbook_frame = tk.Frame(detaileddashboard, bg="#1e1e1e", width=260)
 orderbook_frame.pack(side="right", fill="y", padx=(0, 30))
 
-# Create the OrderBook
-orderbook = OrderBookPanel(orderbook_frame, "BTCUSDT")
+# Create the OrderBook (consolidated over these venues)
+venues = [BinanceVenue(), BybitVenue(), OkxVenue()]
+if feed is not None:
+    venues = [SharedFeedVenue(feed, v.name, v.tag) for v in venues]
+orderbook = OrderBookPanel(orderbook_frame, scheduler, selected["symbol"],
+                           snapshot, venues=venues)
+
+#-----------------------------------------------------------------------------#
+# Time & Sales
+
+# Shares the orderbook column, right below the orderbook
+trade_tape = TradeTapePanel(orderbook_frame, scheduler, selected["symbol"],
+                            feed=feed)
+
+#-----------------------------------------------------------------------------#
+# Local gateway
+
+# Everything the tickers and the orderbook receive goes out to it too,
+# and a ticker toggled off or a book switched away is removed from it
+if gateway is not None:
+    for ticker in dashboard_app.tickers.values():
+        ticker.add_listener(gateway.publish_tick, gateway.remove_tick)
+    orderbook.add_listener(gateway.publish_book, gateway.remove_book)
 
 #-----------------------------------------------------------------------------#
 # Functional display details button
 
 # Bundle up switch graph and currency so the button does both
 def display_detailed(currency, display):
+    selected["symbol"] = currency
+    selected["display"] = display
     candlestick.switch_graph(currency, display)
     orderbook.switch_currency(currency)
+    trade_tape.switch_currency(currency)
 
 
 # Set button commands
@@ -212,13 +297,32 @@ SOLtoggle.set_detailed_view(lambda: display_detailed("SOLUSDT", "SOL/USDT"))
 DOGEtoggle.set_detailed_view(lambda: display_detailed("DOGEUSDT", "DOGE/USDT"))
 SHIBtoggle.set_detailed_view(lambda: display_detailed("SHIBUSDT", "SHIB/USDT"))
 
+#-----------------------------------------------------------------------------#
+# Saving state
+
+# Also save every minute, not only on close, so a crash or kill of a
+# long running dashboard keeps its layout, prices, candles and book
+def save_state():
+    candlestick.save_candles()
+    dashboard_app.store_state()
+    snapshot.save()
+
+state_job = scheduler.register("state_save", save_state, 60000, priority=0)
+state_job.resume()
+
 #-----------------------------------------------------------------------------#
 # Closing app safely
 
 # Bundle up on close methods
 def on_app_close():
+    scheduler.stop()
     candlestick.stop()
     orderbook.stop()
+    trade_tape.stop()
+    if feed is not None:
+        feed.close()
+    if gateway is not None:
+        gateway.stop()
     dashboard_app.on_closing()
 
 # For closing the app safely
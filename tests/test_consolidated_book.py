@@ -0,0 +1,64 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import random
+
+from components.consolidated_book import ConsolidatedBook
+from components.venues import StaticVenue
+
+#-----------------------------------------------------------------------------#
+
+
+def random_book(rng, index):
+    '''Sorted (bids, asks) as strings like the REST APIs send them, prices
+    unique per venue so ties don't depend on merge order'''
+    bids = sorted({round(rng.uniform(99.0, 100.0), 2) for _ in range(rng.randint(0, 20))},
+                  reverse=True)
+    asks = sorted({round(rng.uniform(100.0, 101.0), 2) for _ in range(rng.randint(0, 20))})
+    offset = index / 1000
+    return ([[str(p + offset), str(rng.uniform(0.1, 5.0))] for p in bids],
+            [[str(p + offset), str(rng.uniform(0.1, 5.0))] for p in asks])
+
+
+def full_merge(venues, live, depth):
+    '''Best depth levels of every live venue, sorted from scratch'''
+    bids, asks = [], []
+    for venue in venues:
+        if venue.tag in live:
+            venue_bids, venue_asks = venue.fetch_depth("BTCUSDT", 50)
+            bids += [(p, q, venue.tag) for p, q in venue_bids]
+            asks += [(p, q, venue.tag) for p, q in venue_asks]
+    return (sorted(bids, key=lambda level: -level[0])[:depth],
+            sorted(asks, key=lambda level: level[0])[:depth])
+
+
+def test_incremental_merge_matches_full_merge():
+    rng = random.Random(7)
+    venues = [StaticVenue(f"Venue {i}", f"V{i}") for i in range(4)]
+    book = ConsolidatedBook()
+    live = set()
+
+    for step in range(5000):
+        index = rng.randrange(len(venues))
+        venue = venues[index]
+
+        if venue.tag in live and rng.random() < 0.2:
+            book.remove_venue(venue.tag)
+            live.discard(venue.tag)
+        else:
+            venue.set_book("BTCUSDT", *random_book(rng, index))
+            book.update_venue(venue.tag, *venue.fetch_depth("BTCUSDT", 50))
+            live.add(venue.tag)
+
+        # Several depths, each cached merge is updated on its own
+        for depth in (1, 10, 25):
+            assert book.top(depth) == full_merge(venues, live, depth), step
+
+
+def test_unchanged_venue_is_not_remerged():
+    venue = StaticVenue("Venue", "V0", {"BTCUSDT": ([["100", "1"]], [["101", "1"]])})
+    book = ConsolidatedBook()
+
+    assert book.update_venue("V0", *venue.fetch_depth("BTCUSDT", 10))
+    assert not book.update_venue("V0", *venue.fetch_depth("BTCUSDT", 10))
+    assert book.top(10) == ([(100.0, 1.0, "V0")], [(101.0, 1.0, "V0")])
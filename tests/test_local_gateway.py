@@ -0,0 +1,93 @@
+#-----------------------------------------------------------------------------#
+# Modules
+
+import json
+import time
+import socket
+
+import pytest
+import websocket
+
+from components.local_gateway import LocalGateway
+
+#-----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def gateway():
+    '''Gateway on a free port, stopped after the test'''
+    gateway = LocalGateway(port=0, queue_size=4)
+    gateway.start()
+    gateway.port = gateway.server.sockets[0].getsockname()[1]
+    yield gateway
+    gateway.stop()
+
+
+def connect(gateway):
+    return websocket.create_connection(
+        f"ws://127.0.0.1:{gateway.port}/stream", timeout=5)
+
+
+def receive(ws):
+    return json.loads(ws.recv())
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_snapshot_delta_and_remove(gateway):
+    gateway.publish_tick("BTCUSDT", 65000.0, 120.0, 0.18)
+    wait_for(lambda: gateway.seq == 1)
+
+    ws = connect(gateway)
+    try:
+        snapshot = receive(ws)
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["seq"] == 1
+        ticker = snapshot["state"]["ticker:BTCUSDT"]
+        assert ticker["price"] == 65000.0
+        assert "ts" in ticker
+
+        # Only the fields that changed (and ts) come through
+        gateway.publish_tick("BTCUSDT", 65010.0, 120.0, 0.18)
+        delta = receive(ws)
+        assert delta["type"] == "delta"
+        assert delta["seq"] == 2
+        assert delta["key"] == "ticker:BTCUSDT"
+        assert set(delta["fields"]) == {"price", "ts"}
+        assert delta["fields"]["price"] == 65010.0
+
+        gateway.remove_tick("BTCUSDT")
+        removed = receive(ws)
+        assert removed == {"type": "remove", "key": "ticker:BTCUSDT", "seq": 3}
+    finally:
+        ws.close()
+
+
+def test_slow_client_is_dropped(gateway):
+    # Connected but never reads, so its queue fills up
+    slow = connect(gateway)
+    slow.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    fast = connect(gateway)
+    assert receive(fast)["type"] == "snapshot"
+
+    try:
+        for i in range(2000):
+            # Every level changes, so every delta is a few kB
+            bids = [(100.0 - n, i + n, "BIN") for n in range(200)]
+            asks = [(101.0 + n, i + n, "BIN") for n in range(200)]
+            gateway.publish_book("BTCUSDT", bids, asks)
+            # The fast client keeps up and stays connected
+            assert receive(fast)["type"] == "delta"
+            if gateway.dropped:
+                break
+
+        assert gateway.dropped == 1
+        assert len(gateway.clients) == 1
+    finally:
+        slow.shutdown()
+        fast.close()